@@ -1,79 +1,139 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
+from functools import partial
 
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, Request
-from google.auth.transport import requests as google_auth_requests
-from google.oauth2 import id_token
-from sqlalchemy import insert, select, update
 
 from config import CREDENTIALS_EXCEPTION, app_logger, oauth, oauth2_scheme, settings
+from core.cache import SingleFlight, TTLCache
+from core.google import GoogleCerts
 from core.slack import send_error_to_slack
-from model import db
-from model.db import get_session
+from model import queries
+from model.db import get_read_session, get_session
+from model.notify import listener, publish
 from model.ql import GoogleToken
+from model.sessions import (
+    is_revoked,
+    revoke_sessions,
+    rotate_session,
+    session_login_time,
+    spawn,
+)
 
 router = APIRouter(prefix="/user")
 
+# "name" is kept alongside the identity claims because every handler logs it
+TOKEN_CLAIMS = ("id", "company_id", "email", "name")
 
-def create_token(data, login_time, type="access"):
-    app_logger.info(f"Creating {type} token for {data['name']}")
+USERS_CHANNEL = "users_changed"
+
+token_cache = TTLCache(
+    "tokens", settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+user_cache = TTLCache(
+    "users", settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS
+)
+user_lookups = SingleFlight()
+google_certs = GoogleCerts(settings.GOOGLE_CERTS_URL)
+
+
+def create_token(data, login_time, type="access", sid=None, rotation=0):
+    app_logger.info("Creating {} token for {}", type, data["name"])
     if type == "access":
-        data["token_type"] = "access"
-        data.update(
-            {
-                "exp": login_time
-                + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-            }
-        )
+        expire_minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
     elif type == "refresh":
-        data["token_type"] = "refresh"
-        data.update(
-            {
-                "exp": login_time
-                + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
-            }
-        )
+        expire_minutes = settings.REFRESH_TOKEN_EXPIRE_MINUTES
     else:
         return None
-    data.pop("created_at", None)
-    data.pop("updated_at", None)
-    return jwt.encode(data, settings.API_SECRET_KEY, algorithm="HS256")
+    claims = {key: data[key] for key in TOKEN_CLAIMS}
+    # Google's picture isn't stored with the user, so GET /user/ can only get it here
+    if data.get("image"):
+        claims["image"] = data["image"]
+    claims["token_type"] = type
+    if sid is not None:
+        claims["sid"] = sid
+        if type == "refresh":
+            claims["rot"] = rotation
+    claims["exp"] = login_time + timedelta(minutes=expire_minutes)
+    return jwt.encode(claims, settings.API_SECRET_KEY, algorithm="HS256")
 
 
 def decode_token(token):
-    return jwt.decode(token, settings.API_SECRET_KEY, algorithms=["HS256"])
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, settings.API_SECRET_KEY, algorithms=["HS256"])
+        token_cache.set(key, payload, ttl=payload["exp"] - time.time())
+    return dict(payload)
 
 
-async def get_user_from_email(email: str) -> dict:
-    query = select(db.User).where(db.User.email == email, db.User.deleted == False)
-    async with get_session() as s:
-        user = (await s.execute(query)).first()
+async def fetch_user_from_email(email: str) -> dict:
+    # Fills user_cache, so a lagging replica must not undo an invalidation
+    async with get_read_session(primary=True) as s:
+        result = await s.execute(queries.USER_BY_EMAIL, {"email": email})
+        user = result.mappings().first()
     if not user:
         app_logger.error(f"User with email {email} not found or deleted")
         raise HTTPException(
             status_code=401, detail="User email not found or is deactivated"
         )
-    return {c.name: getattr(user[0], c.name) for c in user[0].__table__.columns}
+    user = dict(user)
+    user_cache.set(("email", email), user)
+    user_cache.set(("id", user["id"]), user)
+    return user
+
+
+async def get_user_from_email(email: str) -> dict:
+    user = user_cache.get(("email", email))
+    if user is None:
+        user = await user_lookups.do(email, partial(fetch_user_from_email, email))
+    return dict(user)
+
+
+def on_users_changed(payload: str):
+    if payload == "*":
+        user_cache.clear()
+        return
+    for id in payload.split(","):
+        user = user_cache.pop(("id", int(id)))
+        if user is not None:
+            user_cache.delete(("email", user["email"]))
+
+
+async def invalidate_users(session, ids):
+    payload = ",".join(str(id) for id in ids) or "*"
+    on_users_changed(payload)
+    await publish(session, USERS_CHANNEL, payload)
+
+
+listener.subscribe(USERS_CHANNEL, on_users_changed)
 
 
 async def get_user_from_token(token: str = Depends(oauth2_scheme)):
     if settings.ENV == "local":
-        payload = {
+        return {
             "email": settings.SUPERUSER_EMAIL,
             "name": settings.SUPERUSER_NAME,
             "id": 1,
             "token_type": "access",
             "company_id": 1,
         }
-    else:
-        try:
-            payload = decode_token(token)
-        except jwt.PyJWTError:
-            app_logger.warning("Decoding token failed")
-            raise CREDENTIALS_EXCEPTION
-
-        if payload["token_type"] != "access":
-            raise HTTPException(status_code=401, detail="Not an access token")
+    return await get_user_from_access_token(token)
+
+
+async def get_user_from_access_token(token: str = Depends(oauth2_scheme)):
+    try:
+        payload = decode_token(token)
+    except jwt.PyJWTError:
+        app_logger.warning("Decoding token failed")
+        raise CREDENTIALS_EXCEPTION
+
+    if payload["token_type"] != "access":
+        raise HTTPException(status_code=401, detail="Not an access token")
+    if is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Session revoked")
     return payload
 
 
@@ -86,6 +146,8 @@ async def refresh_helper(token: str = Depends(oauth2_scheme)):
 
     if payload["token_type"] != "refresh":
         raise HTTPException(status_code=401, detail="Not a refresh token")
+    if is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Session revoked")
 
     user = await get_user_from_email(payload["email"])
     payload.update(user)
@@ -116,17 +178,9 @@ async def authenticate_google_token(google_token: GoogleToken):
     try:
         if settings.ENV != "local":
             try:
-                request = google_auth_requests.Request()
-                resp = id_token.verify_oauth2_token(
-                    google_token.google_token,
-                    request=request,
-                    audience=settings.GOOGLE_CLIENT_ID,
+                resp = await google_certs.verify(
+                    google_token.google_token, settings.GOOGLE_CLIENT_ID
                 )
-                if resp["iss"] not in [
-                    "accounts.google.com",
-                    "https://accounts.google.com",
-                ]:
-                    raise CREDENTIALS_EXCEPTION
             except Exception as e:
                 app_logger.error(f"Google token verification failed: {str(e)}")
                 raise CREDENTIALS_EXCEPTION
@@ -143,18 +197,18 @@ async def authenticate_google_token(google_token: GoogleToken):
                 "image": "https://asdasd",
             }
         login_time = datetime.utcnow()
-        user_data.update({"login_time": str(login_time)})
         user = await get_user_from_email(user_data["email"])
         user_data.update(user)
-        app_logger.info(f"Creating session for {user_data['name']}")
-        query = insert(db.Session).values(
-            {"user_id": user["id"], "login_time": login_time}
-        )
+        app_logger.info("Creating session for {}", user_data["name"])
         async with get_session() as s:
-            await s.execute(query)
+            result = await s.execute(
+                queries.INSERT_SESSION,
+                {"user_id": user["id"], "login_time": login_time},
+            )
+            sid = result.scalar_one()
         return {
-            "access_token": create_token(user_data, login_time),
-            "refresh_token": create_token(user_data, login_time, "refresh"),
+            "access_token": create_token(user_data, login_time, sid=sid),
+            "refresh_token": create_token(user_data, login_time, "refresh", sid),
         }
     except Exception as e:
         app_logger.exception(f"Error authenticating Google token: {e}")
@@ -167,27 +221,26 @@ async def authenticate_google_token(google_token: GoogleToken):
 @router.post("/refresh")
 async def refresh(user=Depends(refresh_helper)):
     try:
-        login_time = datetime.utcnow()
-        update_query = (
-            update(db.Session)
-            .where(
-                db.Session.user_id == user["id"],
-            )
-            .values({"deleted": True})
-        )
-        insert_query = insert(db.Session).values(
-            {"user_id": user["id"], "login_time": login_time}
-        )
-        async with get_session() as s:
-            await s.execute(update_query)
-            await s.execute(insert_query)
-        app_logger.info(
-            f"Expired all old sessions for the user and created a new session for {user['name']}"
-        )
-        user.pop("login_time")
-        user.pop("exp")
-        user.update({"login_time": str(login_time)})
-        return {"access_token": create_token(user, login_time)}
+        login_time = session_login_time(user)
+        sid = user.get("sid")
+        if sid is None:
+            # Refresh tokens minted before sessions were carried in them
+            async with get_session() as s:
+                result = await s.execute(
+                    queries.INSERT_SESSION,
+                    {"user_id": user["id"], "login_time": login_time},
+                )
+                sid = result.scalar_one()
+            rotation = 0
+        else:
+            # Recorded in the background; the revocation set already vouched for it
+            spawn(rotate_session(sid, user["rot"]))
+            rotation = user["rot"] + 1
+        app_logger.info("Rotated refresh token of session {} for {}", sid, user["name"])
+        return {
+            "access_token": create_token(user, datetime.utcnow(), sid=sid),
+            "refresh_token": create_token(user, login_time, "refresh", sid, rotation),
+        }
     except Exception as e:
         app_logger.exception(f"Error refreshing token: {e}")
         await send_error_to_slack(f"Error refreshing token: {e}")
@@ -197,16 +250,10 @@ async def refresh(user=Depends(refresh_helper)):
 @router.get("/logout")
 async def logout(user=Depends(get_user_from_token)):
     try:
-        query = (
-            update(db.Session)
-            .where(
-                db.Session.user_id == user["id"],
-            )
-            .values({"deleted": True})
-        )
         async with get_session() as s:
-            await s.execute(query)
-        app_logger.info(f"{user['name']} logged out")
+            result = await s.execute(queries.EXPIRE_SESSIONS, {"user_id": user["id"]})
+            await revoke_sessions(s, result.scalars().all())
+        app_logger.info("{} logged out", user["name"])
         return {"msg": "Logged out successfully"}
     except Exception as e:
         app_logger.exception(f"Error logging out: {e}")
@@ -217,8 +264,21 @@ async def logout(user=Depends(get_user_from_token)):
 @router.get("/")
 async def get_user(user=Depends(get_user_from_token)):
     try:
-        app_logger.info(f"{user['name']} fetched own user details")
+        # Tokens carry only identity claims, so the rest of the record is loaded
+        record = await get_user_from_email(user["email"])
+        record.pop("created_at", None)
+        record.pop("updated_at", None)
+        user.update(record)
+        if "exp" in user:
+            # Access tokens expire a fixed time after they're issued
+            issued = datetime.utcfromtimestamp(user["exp"]) - timedelta(
+                minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+            )
+            user["login_time"] = str(issued)
+        app_logger.info("{} fetched own user details", user["name"])
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         app_logger.exception(f"Error fetching user details: {e}")
         await send_error_to_slack(f"Error fetching user details: {e}")
@@ -0,0 +1,196 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, insert, select, update
+
+from config import app_logger
+from core.slack import send_error_to_slack
+from model import queries
+from model.db import OrderItem, SalesOrder, get_session
+from model.inventory import reserve_stock
+from model.ql import OrderRequest, OrderStatusRequest
+from model.read import fetch_customer_sales, fetch_daily_sales, fetch_product_sales
+from model.rollups import set_order_status
+
+from .auth import get_user_from_token
+
+router = APIRouter(prefix="/orders")
+
+DEFAULT_SALES_RANGE_DAYS = 30
+MAX_SALES_RANGE_DAYS = 366
+
+
+def sales_range(
+    start: Optional[date] = None, end: Optional[date] = None
+) -> tuple[date, date]:
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_SALES_RANGE_DAYS - 1)
+    if start > end or (end - start).days >= MAX_SALES_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    return start, end
+
+
+async def place_order(session, customer_id: int, quantities: dict[str, int]) -> dict:
+    """Creates an order and reserves its stock; raises 409 if any item is short.
+
+    Must run inside get_session() so a shortfall rolls back the whole order.
+    """
+    now = datetime.utcnow()
+    # The order row touches no shared rows, so insert it before any stock is locked
+    order_id = (
+        await session.execute(
+            queries.INSERT_ORDER, {"customer_id": customer_id, "now": now}
+        )
+    ).scalar_one()
+
+    rows = []
+    # Lock inventory rows in a fixed order so multi-item orders can't deadlock
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        price = await reserve_stock(session, product_id, quantity, now)
+        if price is None:
+            raise HTTPException(
+                status_code=409, detail=f"Insufficient stock for product {product_id}"
+            )
+        rows.append(
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price": price,
+                "created_at": now,
+                "updated_at": now,
+                "deleted": False,
+            }
+        )
+
+    # Items and the total are written in one statement, the total summed in SQL
+    items = (
+        insert(OrderItem)
+        .values(rows)
+        .returning(OrderItem.price, OrderItem.quantity)
+        .cte("items")
+    )
+    total_amount = (
+        await session.execute(
+            update(SalesOrder.__table__)
+            .where(SalesOrder.id == order_id)
+            .values(
+                total_amount=select(
+                    func.sum(items.c.price * items.c.quantity)
+                ).scalar_subquery()
+            )
+            .returning(SalesOrder.total_amount)
+        )
+    ).scalar_one()
+
+    return {
+        "order_id": order_id,
+        "total_amount": total_amount,
+        "items": [
+            {key: row[key] for key in ("product_id", "quantity", "price")}
+            for row in rows
+        ],
+    }
+
+
+@router.post("/")
+async def create_order(order: OrderRequest, user=Depends(get_user_from_token)):
+    try:
+        quantities = Counter()
+        for item in order.items:
+            quantities[item.product_id] += item.quantity
+
+        async with get_session() as session:
+            data = await place_order(session, user["id"], quantities)
+
+        app_logger.info(
+            "Order {} created successfully for {}", data["order_id"], user["name"]
+        )
+        return {"message": "Order created successfully", "data": data}
+    except HTTPException as e:
+        # Running out of stock is expected under load, not worth a Slack alert
+        app_logger.info("Order for {} rejected: {}", user["name"], e.detail)
+        raise
+    except Exception as e:
+        app_logger.exception(f"Error creating order: {e}")
+        await send_error_to_slack(f"Error creating order: {e}")
+        return HTTPException(status_code=500, detail="Error creating order")
+
+
+@router.put("/{id}/status")
+async def update_order_status(
+    id: int, request: OrderStatusRequest, user=Depends(get_user_from_token)
+):
+    try:
+        async with get_session() as session:
+            order = (
+                await session.execute(
+                    select(SalesOrder)
+                    .where(SalesOrder.id == id, SalesOrder.deleted == False)
+                    .with_for_update()
+                )
+            ).scalar_one_or_none()
+            if not order:
+                raise HTTPException(status_code=404, detail="Order not found")
+            await set_order_status(session, order, request.status)
+
+        app_logger.info("Order {} moved to {}", id, request.status)
+        return {
+            "message": "Order status updated successfully",
+            "data": {"order_id": id, "status": request.status},
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        app_logger.exception(f"Error updating order {id} status: {e}")
+        await send_error_to_slack(f"Error updating order {id} status: {e}")
+        return HTTPException(status_code=500, detail="Error updating order status")
+
+
+@router.get("/sales/daily")
+async def get_daily_sales(
+    dates=Depends(sales_range), user=Depends(get_user_from_token)
+):
+    try:
+        data = await fetch_daily_sales(*dates)
+        app_logger.info("{} fetched daily sales", user["name"])
+        return {"message": "Daily sales retrieved successfully", "data": data}
+    except Exception as e:
+        app_logger.exception(f"Error fetching daily sales: {e}")
+        await send_error_to_slack(f"Error fetching daily sales: {e}")
+        return HTTPException(status_code=500, detail="Error fetching daily sales")
+
+
+@router.get("/sales/products")
+async def get_product_sales(
+    product_id: Optional[str] = None,
+    dates=Depends(sales_range),
+    user=Depends(get_user_from_token),
+):
+    try:
+        data = await fetch_product_sales(*dates, product_id)
+        app_logger.info("{} fetched product sales", user["name"])
+        return {"message": "Product sales retrieved successfully", "data": data}
+    except Exception as e:
+        app_logger.exception(f"Error fetching product sales: {e}")
+        await send_error_to_slack(f"Error fetching product sales: {e}")
+        return HTTPException(status_code=500, detail="Error fetching product sales")
+
+
+@router.get("/sales/customers")
+async def get_customer_sales(
+    customer_id: Optional[int] = None,
+    dates=Depends(sales_range),
+    user=Depends(get_user_from_token),
+):
+    try:
+        data = await fetch_customer_sales(*dates, customer_id)
+        app_logger.info("{} fetched customer sales", user["name"])
+        return {"message": "Customer sales retrieved successfully", "data": data}
+    except Exception as e:
+        app_logger.exception(f"Error fetching customer sales: {e}")
+        await send_error_to_slack(f"Error fetching customer sales: {e}")
+        return HTTPException(status_code=500, detail="Error fetching customer sales")
@@ -1,18 +1,116 @@
+import json
 from datetime import datetime
+from typing import Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import (
+    Boolean,
+    String,
+    Text,
+    cast,
+    column,
+    func,
+    literal_column,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from config import app_logger
+from config import app_logger, settings
+from core.cache import TTLCache
+from core.compression import cache_compressed
+from core.conditional import (
+    has_validators,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    validators,
+)
+from core.pagination import (
+    decode_cursor,
+    decode_rank_cursor,
+    encode_cursor,
+    encode_rank_cursor,
+)
 from core.slack import send_error_to_slack
+from model import queries
 from model.db import Product, get_session
-from model.ql import EditProductRequest, ProductRequest
+from model.inventory import shard_inventory
+from model.notify import listener, publish
+from model.ql import (
+    BulkDeleteProductRequest,
+    BulkEditProductRequest,
+    BulkProductRequest,
+    EditProductRequest,
+    InventorySlotsRequest,
+    ProductRequest,
+)
+from model.read import (
+    fetch_product,
+    fetch_product_version,
+    fetch_products,
+    fetch_products_version,
+    search_products,
+    stream_products,
+)
 
 from .auth import get_user_from_token
 
 router = APIRouter(prefix="/products")
 
+STREAM_BATCH_SIZE = 500
+# Keeps each multi-row statement well under asyncpg's 32767 bind parameter limit
+BULK_CHUNK_SIZE = 1000
+PRODUCTS_CHANNEL = "products_changed"
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+product_cache = TTLCache(
+    "products", settings.PRODUCT_CACHE_SIZE, settings.PRODUCT_CACHE_TTL_SECONDS
+)
+product_list_cache = TTLCache(
+    "product_lists", settings.PRODUCT_CACHE_SIZE, settings.PRODUCT_CACHE_TTL_SECONDS
+)
+# Compressed product responses, keyed by ETag and cleared with the caches above
+compressed_cache = TTLCache(
+    "compressed_products",
+    settings.COMPRESSION_CACHE_SIZE,
+    settings.COMPRESSION_CACHE_TTL_SECONDS,
+)
+
+
+async def products_version():
+    # Cleared with the list pages, so polling clients cost no queries between writes
+    version = product_list_cache.get("version")
+    if version is None:
+        version = await fetch_products_version()
+        product_list_cache.set("version", version)
+    return version
+
+
+def on_products_changed(payload: str):
+    product_list_cache.clear()
+    compressed_cache.clear()
+    if payload == "*":
+        product_cache.clear()
+        return
+    for id in payload.split(","):
+        product_cache.delete(id)
+
+
+async def invalidate_products(session, ids):
+    payload = ",".join(ids)
+    if not payload or len(payload) > NOTIFY_PAYLOAD_LIMIT:
+        payload = "*"
+    await session.execute(queries.BUMP_PRODUCTS_VERSION)
+    on_products_changed(payload)
+    await publish(session, PRODUCTS_CHANNEL, payload)
+
+
+listener.subscribe(PRODUCTS_CHANNEL, on_products_changed)
+
 
 @router.post("/")
 async def create_product(product: ProductRequest, user=Depends(get_user_from_token)):
@@ -28,8 +126,9 @@ async def create_product(product: ProductRequest, user=Depends(get_user_from_tok
 
         async with get_session() as session:
             session.add(new_product)
+            await invalidate_products(session, [product_id])
 
-        app_logger.info(f"Product created successfully: {product_id}")
+        app_logger.info("Product created successfully: {}", product_id)
         return {
             "message": "Product created successfully",
             "data": {"product_id": product_id},
@@ -40,47 +139,270 @@ async def create_product(product: ProductRequest, user=Depends(get_user_from_tok
         return HTTPException(status_code=500, detail="Error creating product")
 
 
-@router.get("/")
-async def get_products(user=Depends(get_user_from_token)):
+@router.post("/bulk")
+async def create_products_bulk(
+    request: BulkProductRequest, user=Depends(get_user_from_token)
+):
     try:
-        stmt = select(Product).filter(Product.deleted == False)
+        now = datetime.utcnow()
+        rows = {}
+        for product in request.products:
+            product_data = product.dict()
+            product_data["id"] = product_data["id"] or str(uuid4())
+            rows[product_data["id"]] = {
+                **product_data,
+                "created_at": now,
+                "updated_at": now,
+                "deleted": False,
+            }
+        rows = list(rows.values())
+
+        results = []
+        async with get_session() as session:
+            for i in range(0, len(rows), BULK_CHUNK_SIZE):
+                stmt = pg_insert(Product).values(rows[i : i + BULK_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Product.id],
+                    set_={
+                        "name": stmt.excluded.name,
+                        "description": stmt.excluded.description,
+                        "price": stmt.excluded.price,
+                        "updated_at": stmt.excluded.updated_at,
+                        "deleted": False,
+                    },
+                ).returning(Product.id, literal_column("xmax = 0").label("created"))
+                result = await session.execute(stmt)
+                results.extend(
+                    {
+                        "product_id": row.id,
+                        "status": "created" if row.created else "updated",
+                    }
+                    for row in result
+                )
+            await invalidate_products(session, [row["product_id"] for row in results])
+
+        app_logger.info("{} products upserted in bulk", len(results))
+        return {"message": "Products created successfully", "data": results}
+    except Exception as e:
+        app_logger.exception(f"Error creating products in bulk: {e}")
+        await send_error_to_slack(f"Error creating products in bulk: {e}")
+        return HTTPException(status_code=500, detail="Error creating products")
+
+
+@router.put("/bulk")
+async def update_products_bulk(
+    request: BulkEditProductRequest, user=Depends(get_user_from_token)
+):
+    try:
+        now = datetime.utcnow()
+        rows = {product.id: product for product in request.products}
+        items = list(rows.values())
+        updated_ids = set()
+        async with get_session() as session:
+            for i in range(0, len(items), BULK_CHUNK_SIZE):
+                edits = values(
+                    column("id", String),
+                    column("name", String),
+                    column("description", Text),
+                    column("deleted", Boolean),
+                    name="edits",
+                ).data(
+                    [
+                        (item.id, item.name, item.description, item.deleted)
+                        for item in items[i : i + BULK_CHUNK_SIZE]
+                    ]
+                )
+                stmt = (
+                    update(Product)
+                    .where(Product.id == edits.c.id)
+                    .values(
+                        name=func.coalesce(cast(edits.c.name, String), Product.name),
+                        description=func.coalesce(
+                            cast(edits.c.description, Text), Product.description
+                        ),
+                        deleted=func.coalesce(
+                            cast(edits.c.deleted, Boolean), Product.deleted
+                        ),
+                        updated_at=now,
+                    )
+                    .returning(Product.id)
+                )
+                result = await session.execute(stmt)
+                updated_ids.update(result.scalars().all())
+            await invalidate_products(session, updated_ids)
+
+        results = [
+            {
+                "product_id": id,
+                "status": "updated" if id in updated_ids else "not_found",
+            }
+            for id in rows
+        ]
+        app_logger.info("{} products updated in bulk", len(updated_ids))
+        return {"message": "Products updated successfully", "data": results}
+    except Exception as e:
+        app_logger.exception(f"Error updating products in bulk: {e}")
+        await send_error_to_slack(f"Error updating products in bulk: {e}")
+        return HTTPException(status_code=500, detail="Error updating products")
+
+
+@router.delete("/bulk")
+async def delete_products_bulk(
+    request: BulkDeleteProductRequest, user=Depends(get_user_from_token)
+):
+    try:
+        now = datetime.utcnow()
+        ids = list(dict.fromkeys(request.ids))
+        stmt = (
+            update(Product)
+            .where(Product.id.in_(ids), Product.deleted == False)
+            .values(deleted=True, updated_at=now)
+            .returning(Product.id)
+        )
         async with get_session() as session:
             result = await session.execute(stmt)
-            products = result.scalars().all()
-
-        products_list = []
-        for product in products:
-            products_list.append(
-                {
-                    **product.__dict__,
-                }
+            deleted_ids = set(result.scalars().all())
+            await invalidate_products(session, deleted_ids)
+
+        results = [
+            {
+                "product_id": id,
+                "status": "deleted" if id in deleted_ids else "not_found",
+            }
+            for id in ids
+        ]
+        app_logger.info("{} products deleted in bulk", len(deleted_ids))
+        return {"message": "Products deleted successfully", "data": results}
+    except Exception as e:
+        app_logger.exception(f"Error deleting products in bulk: {e}")
+        await send_error_to_slack(f"Error deleting products in bulk: {e}")
+        return HTTPException(status_code=500, detail="Error deleting products")
+
+
+@router.get("/")
+async def get_products(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    user=Depends(get_user_from_token),
+):
+    # Outside the try, so a bad cursor is a 400 and not a reported 500
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        if stream:
+            app_logger.info("Streaming all products")
+            return StreamingResponse(
+                products_ndjson(), media_type="application/x-ndjson"
             )
+
+        version, last_modified = await products_version()
+        etag = make_etag("products", version, limit, cursor, weak=True)
+        headers = validators(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            app_logger.info("Products not modified")
+            return not_modified(headers)
+        cache_compressed(request, compressed_cache)
+
+        page = product_list_cache.get((limit, cursor))
+        if page is not None:
+            # Only on success, so an error body is never cached under a validator
+            response.headers.update(headers)
+            app_logger.info("Products retrieved from cache")
+            return {"message": "Products retrieved successfully", **page}
+
+        products_list = await fetch_products(limit + 1, after)
+
+        next_cursor = None
+        if len(products_list) > limit:
+            products_list = products_list[:limit]
+            last = products_list[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+
+        page = {"data": products_list, "next_cursor": next_cursor}
+        product_list_cache.set((limit, cursor), page)
+        response.headers.update(headers)
         app_logger.info("Products retrieved successfully")
+        return {"message": "Products retrieved successfully", **page}
+    except Exception as e:
+        app_logger.exception(f"Error fetching products: {e}")
+        await send_error_to_slack(f"Error fetching products: {e}")
+        return HTTPException(status_code=500, detail="Error fetching products")
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[list[str]] = Query(None),
+    fuzzy: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user=Depends(get_user_from_token),
+):
+    after = decode_rank_cursor(cursor) if cursor else None
+    try:
+        products_list = await search_products(q, limit + 1, category, fuzzy, after)
+
+        next_cursor = None
+        if len(products_list) > limit:
+            products_list = products_list[:limit]
+            last = products_list[-1]
+            next_cursor = encode_rank_cursor(last["rank"], last["id"])
+
+        app_logger.info("Products searched for {!r}", q)
         return {
             "message": "Products retrieved successfully",
             "data": products_list,
+            "next_cursor": next_cursor,
         }
     except Exception as e:
-        app_logger.exception(f"Error fetching products: {e}")
-        await send_error_to_slack(f"Error fetching products: {e}")
-        return HTTPException(status_code=500, detail="Error fetching products")
+        app_logger.exception(f"Error searching products: {e}")
+        await send_error_to_slack(f"Error searching products: {e}")
+        return HTTPException(status_code=500, detail="Error searching products")
+
+
+async def products_ndjson():
+    async for rows in stream_products(STREAM_BATCH_SIZE):
+        yield "".join(json.dumps(jsonable_encoder(row)) + "\n" for row in rows)
 
 
 @router.get("/{id}")
-async def get_product(id: str, user=Depends(get_user_from_token)):
+async def get_product(
+    id: str, request: Request, response: Response, user=Depends(get_user_from_token)
+):
     try:
-        stmt = select(Product).filter(Product.id == id, Product.deleted == False)
-        async with get_session() as session:
-            result = await session.execute(stmt)
-            product = result.scalar_one_or_none()
+        cache_compressed(request, compressed_cache)
+        product_dict = product_cache.get(id)
+        if product_dict is not None:
+            version = product_dict["updated_at"] or product_dict["created_at"]
+            headers = validators(make_etag("product", id, version), version)
+            if is_not_modified(request, headers["ETag"], version):
+                return not_modified(headers)
+            response.headers.update(headers)
+            app_logger.info("Product {} retrieved from cache", id)
+            return {
+                "message": "Product retrieved successfully",
+                "data": product_dict,
+            }
 
-        if not product:
+        if has_validators(request):
+            # Check freshness with one column before loading the whole row
+            version = await fetch_product_version(id)
+            if version is not None:
+                headers = validators(make_etag("product", id, version), version)
+                if is_not_modified(request, headers["ETag"], version):
+                    app_logger.info("Product {} not modified", id)
+                    return not_modified(headers)
+
+        product_dict = await fetch_product(id)
+        if not product_dict:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        product_dict = {
-            **product.__dict__,
-        }
-        app_logger.info(f"Product {id} retrieved successfully")
+        product_cache.set(id, product_dict)
+        version = product_dict["updated_at"] or product_dict["created_at"]
+        response.headers.update(validators(make_etag("product", id, version), version))
+        app_logger.info("Product {} retrieved successfully", id)
         return {
             "message": "Product retrieved successfully",
             "data": product_dict,
@@ -106,8 +428,9 @@ async def update_product(
             for key, value in product_data.items():
                 setattr(db_product, key, value)
             db_product.updated_at = now
+            await invalidate_products(session, [id])
 
-        app_logger.info(f"Product {id} updated successfully")
+        app_logger.info("Product {} updated successfully", id)
         return {"message": "Product updated successfully", "data": {"product_id": id}}
     except Exception as e:
         app_logger.exception(f"Error updating product {id}: {e}")
@@ -125,10 +448,36 @@ async def delete_product(id: str, user=Depends(get_user_from_token)):
                 raise HTTPException(status_code=404, detail="Product not found")
             db_product.deleted = True
             db_product.updated_at = now
+            await invalidate_products(session, [id])
 
-        app_logger.info(f"Product {id} deleted successfully")
+        app_logger.info("Product {} deleted successfully", id)
         return {"message": "Product deleted successfully", "data": {"product_id": id}}
     except Exception as e:
         app_logger.exception(f"Error deleting product {id}: {e}")
         await send_error_to_slack(f"Error deleting product {id}: {e}")
         return HTTPException(status_code=500, detail="Error deleting product")
+
+
+@router.put("/{id}/slots")
+async def update_inventory_slots(
+    id: str, request: InventorySlotsRequest, user=Depends(get_user_from_token)
+):
+    try:
+        async with get_session() as session:
+            stock = await shard_inventory(session, id, request.slots)
+            if stock is None:
+                raise HTTPException(status_code=404, detail="Inventory not found")
+
+        app_logger.info(
+            "Inventory of product {} split into {} slots", id, request.slots
+        )
+        return {
+            "message": "Inventory slots updated successfully",
+            "data": {"product_id": id, "slots": request.slots, "quantity": stock},
+        }
+    except Exception as e:
+        app_logger.exception(f"Error updating inventory slots of product {id}: {e}")
+        await send_error_to_slack(
+            f"Error updating inventory slots of product {id}: {e}"
+        )
+        return HTTPException(status_code=500, detail="Error updating inventory slots")
@@ -1,12 +1,20 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy import select
 
 from config import app_logger
+from core.conditional import (
+    has_validators,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    validators,
+)
 from core.slack import send_error_to_slack
 from model.db import Company, get_session
 from model.ql import EditCompanyRequest
+from model.read import fetch_company, fetch_company_version
 
 from .auth import get_user_from_token
 
@@ -14,16 +22,31 @@ router = APIRouter(prefix="/company")
 
 
 @router.get("/{company_id}")
-async def get_company(company_id: int, user=Depends(get_user_from_token)):
+async def get_company(
+    company_id: int,
+    request: Request,
+    response: Response,
+    user=Depends(get_user_from_token),
+):
     try:
-        async with get_session() as session:
-            stmt = select(Company).filter(Company.id == company_id)
-            result = await session.execute(stmt)
-            company = result.scalar_one_or_none()
-            company_dict = company.__dict__
-            company_dict.pop("_sa_instance_state", None)
-            app_logger.info(f"Company {company_id} retrieved successfully")
-            return {"message": "Company retrieved successfully", "data": company_dict}
+        if has_validators(request):
+            # Check freshness with one column before loading the whole row
+            version = await fetch_company_version(company_id)
+            if version is not None:
+                headers = validators(make_etag("company", company_id, version), version)
+                if is_not_modified(request, headers["ETag"], version):
+                    app_logger.info("Company {} not modified", company_id)
+                    return not_modified(headers)
+
+        company_dict = await fetch_company(company_id)
+        if not company_dict:
+            raise HTTPException(status_code=404, detail="Company not found")
+        version = company_dict["updated_at"] or company_dict["created_at"]
+        response.headers.update(
+            validators(make_etag("company", company_id, version), version)
+        )
+        app_logger.info("Company {} retrieved successfully", company_id)
+        return {"message": "Company retrieved successfully", "data": company_dict}
     except Exception as e:
         app_logger.error(f"Error fetching company {company_id}: {e}")
         await send_error_to_slack(f"Error fetching company {company_id}: {e}")
@@ -47,7 +70,7 @@ async def update_company(
             db_company = result.scalar_one_or_none()
             for key, value in update_data.items():
                 setattr(db_company, key, value)
-        app_logger.info(f"Company {company_id} updated successfully")
+        app_logger.info("Company {} updated successfully", company_id)
         return {
             "message": "Company updated successfully",
             "data": {"company_id": company_id},
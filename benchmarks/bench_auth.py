@@ -0,0 +1,63 @@
+# Per-request auth cost before/after the verified-claims cache and compact tokens.
+# Run with: python -m benchmarks.bench_auth
+import timeit
+from datetime import datetime, timedelta
+
+import jwt
+
+from api.auth import create_token, decode_token, token_cache
+from config import settings
+
+N = 20000
+
+
+def full_row_token(login_time):
+    # Shape of the tokens minted before compact claims: the whole user row
+    data = {
+        "id": 1,
+        "email": settings.SUPERUSER_EMAIL,
+        "company_id": 1,
+        "deleted": False,
+        "name": settings.SUPERUSER_NAME,
+        "image": "https://lh3.googleusercontent.com/a/" + "x" * 80,
+        "login_time": str(login_time),
+        "token_type": "access",
+        "exp": login_time + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    }
+    return jwt.encode(data, settings.API_SECRET_KEY, algorithm="HS256")
+
+
+def run(label, fn):
+    seconds = timeit.timeit(fn, number=N)
+    print(f"{label:<40} {seconds / N * 1e6:8.2f} us/request")
+
+
+def main():
+    login_time = datetime.utcnow()
+    user = {
+        "id": 1,
+        "company_id": 1,
+        "email": settings.SUPERUSER_EMAIL,
+        "name": settings.SUPERUSER_NAME,
+    }
+    before = full_row_token(login_time)
+    after = create_token(user, login_time)
+    print(
+        f"Authorization header bytes: before={len(before) + 7} after={len(after) + 7}"
+    )
+
+    run(
+        "before: jwt.decode, full-row token",
+        lambda: jwt.decode(before, settings.API_SECRET_KEY, algorithms=["HS256"]),
+    )
+    run(
+        "after: jwt.decode, compact token",
+        lambda: jwt.decode(after, settings.API_SECRET_KEY, algorithms=["HS256"]),
+    )
+    token_cache.clear()
+    run("after: decode_token, cached", lambda: decode_token(after))
+    print(token_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
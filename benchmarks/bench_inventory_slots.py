@@ -0,0 +1,92 @@
+# Orders/sec on one hot SKU: the single inventories row vs stock sharded over
+# inventory_slots. Stock covers every buyer, so the numbers measure lock
+# contention rather than sell-outs. Needs ASYNCPG_URL to point at a reachable
+# Postgres with the superuser seeded (GET /reset_db).
+# Run with: python -m benchmarks.bench_inventory_slots
+import asyncio
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import select, update
+
+from api.orders import place_order
+from model.db import Inventory, Product, engine, get_session
+from model.inventory import shard_inventory
+from model.queries import FOLD_SLOTS
+
+BUYERS = 2000
+SLOTS = (0, 4, 16, 64)
+CUSTOMER_ID = 1
+
+
+async def setup() -> str:
+    product_id = str(uuid4())
+    now = datetime.utcnow()
+    async with get_session() as s:
+        s.add(
+            Product(
+                id=product_id,
+                name="Hot SKU",
+                description="bench_inventory_slots",
+                price=10,
+                created_at=now,
+                updated_at=now,
+                deleted=False,
+            )
+        )
+        await s.flush()
+        s.add(Inventory(product_id=product_id, created_at=now, deleted=False))
+    return product_id
+
+
+async def buy(product_id):
+    async with get_session() as s:
+        await place_order(s, CUSTOMER_ID, {product_id: 1})
+
+
+async def measure(product_id, slots):
+    async with get_session() as s:
+        await shard_inventory(s, product_id, 0)
+        await s.execute(
+            update(Inventory.__table__)
+            .where(Inventory.product_id == product_id)
+            .values(quantity_in_stock=BUYERS)
+        )
+    async with get_session() as s:
+        await shard_inventory(s, product_id, slots)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(buy(product_id) for _ in range(BUYERS)), return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+
+    async with get_session() as s:
+        await s.execute(FOLD_SLOTS, {"now": datetime.utcnow()})
+        left = (
+            await s.execute(
+                select(Inventory.quantity_in_stock).where(
+                    Inventory.product_id == product_id
+                )
+            )
+        ).scalar_one()
+    errors = sum(isinstance(result, Exception) for result in results)
+    label = f"{slots} slots" if slots else "single row"
+    print(
+        f"{label:<12} {BUYERS / elapsed:8.0f} orders/s  left {left:5}  errors {errors}"
+    )
+
+
+async def main():
+    try:
+        product_id = await setup()
+        for slots in SLOTS:
+            await measure(product_id, slots)
+    except Exception as e:
+        print(f"skipped, Postgres not reachable: {e}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+# Hundreds of concurrent buyers of one SKU with limited stock. Compares
+# read-then-write, SELECT ... FOR UPDATE and the conditional UPDATE used by
+# POST /orders, reporting throughput and whether any stock was oversold.
+# Needs ASYNCPG_URL to point at a reachable Postgres with the superuser seeded
+# (GET /reset_db). Run with: python -m benchmarks.bench_orders
+import asyncio
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from api.orders import place_order
+from model.db import Inventory, Product, engine, get_session
+from model.queries import RESERVE_STOCK
+
+BUYERS = 500
+STOCK = 100
+CUSTOMER_ID = 1
+
+
+async def read_then_write(product_id):
+    async with get_session() as s:
+        stock = (
+            await s.execute(
+                select(Inventory.quantity_in_stock).where(
+                    Inventory.product_id == product_id
+                )
+            )
+        ).scalar_one()
+        if stock < 1:
+            return False
+        await s.execute(
+            update(Inventory.__table__)
+            .where(Inventory.product_id == product_id)
+            .values(quantity_in_stock=stock - 1)
+        )
+    return True
+
+
+async def select_for_update(product_id):
+    async with get_session() as s:
+        stock = (
+            await s.execute(
+                select(Inventory.quantity_in_stock)
+                .where(Inventory.product_id == product_id)
+                .with_for_update()
+            )
+        ).scalar_one()
+        if stock < 1:
+            return False
+        await s.execute(
+            update(Inventory.__table__)
+            .where(Inventory.product_id == product_id)
+            .values(quantity_in_stock=stock - 1)
+        )
+    return True
+
+
+async def conditional_update(product_id):
+    async with get_session() as s:
+        result = await s.execute(
+            RESERVE_STOCK,
+            {"product_id": product_id, "quantity": 1, "now": datetime.utcnow()},
+        )
+        return result.first() is not None
+
+
+async def full_order(product_id):
+    try:
+        async with get_session() as s:
+            await place_order(s, CUSTOMER_ID, {product_id: 1})
+    except HTTPException:
+        return False
+    return True
+
+
+async def setup() -> str:
+    product_id = str(uuid4())
+    now = datetime.utcnow()
+    async with get_session() as s:
+        s.add(
+            Product(
+                id=product_id,
+                name="Contended SKU",
+                description="bench_orders",
+                price=10,
+                created_at=now,
+                updated_at=now,
+                deleted=False,
+            )
+        )
+        await s.flush()
+        s.add(
+            Inventory(
+                product_id=product_id,
+                quantity_in_stock=STOCK,
+                created_at=now,
+                deleted=False,
+            )
+        )
+    return product_id
+
+
+async def measure(label, buy, product_id):
+    async with get_session() as s:
+        await s.execute(
+            update(Inventory.__table__)
+            .where(Inventory.product_id == product_id)
+            .values(quantity_in_stock=STOCK)
+        )
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(buy(product_id) for _ in range(BUYERS)), return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    sold = sum(result is True for result in results)
+    errors = sum(isinstance(result, Exception) for result in results)
+    async with get_session() as s:
+        left = (
+            await s.execute(
+                select(Inventory.quantity_in_stock).where(
+                    Inventory.product_id == product_id
+                )
+            )
+        ).scalar_one()
+    print(
+        f"{label:<20} {BUYERS / elapsed:8.0f} buyers/s  sold {sold:4}  "
+        f"left {left:4}  oversold {max(sold + left - STOCK, 0):4}  errors {errors}"
+    )
+
+
+async def main():
+    try:
+        product_id = await setup()
+        await measure("read_then_write", read_then_write, product_id)
+        await measure("select_for_update", select_for_update, product_id)
+        await measure("conditional_update", conditional_update, product_id)
+        await measure("place_order", full_order, product_id)
+    except Exception as e:
+        print(f"skipped, Postgres not reachable: {e}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+# Cost of one rate-limit check against the shared-memory token buckets, for a
+# few hot clients and for many distinct ones. Needs no database.
+# Run with: python -m benchmarks.bench_rate_limit
+import os
+import tempfile
+import time
+
+from core.ratelimit import SharedBuckets
+
+CHECKS = 200_000
+SLOTS = 65536
+
+
+def measure(label, buckets, keys):
+    start = time.perf_counter()
+    for i in range(CHECKS):
+        buckets.take(keys[i % len(keys)], 1000.0, 2000)
+    per_check = (time.perf_counter() - start) / CHECKS * 1e6
+    print(f"{label:<24} {per_check:6.2f}us per check")
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench-rate-limits")
+    buckets = SharedBuckets(path, SLOTS)
+    try:
+        measure("one client", buckets, ["/products/|user:1"])
+        measure("100 clients", buckets, [f"*|user:{i}" for i in range(100)])
+        ips = [f"*|ip:10.0.{i // 256}.{i % 256}" for i in range(10000)]
+        measure("10000 clients", buckets, ips)
+    finally:
+        buckets.close()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Rows/sec and allocations for ORM hydration vs column-projected Core reads.
+# Uses an in-memory SQLite copy of the products table so only the Python-side
+# cost is measured. Run with: python -m benchmarks.bench_read
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from model.db import Product
+from model.queries import PRODUCT_COLUMNS
+
+ROWS = 20000
+ROUNDS = 5
+
+
+def orm_path(engine):
+    with Session(engine) as session:
+        products = session.execute(select(Product)).scalars().all()
+        products_list = []
+        for product in products:
+            product_dict = {**product.__dict__}
+            product_dict.pop("_sa_instance_state", None)
+            products_list.append(product_dict)
+    return products_list
+
+
+def core_path(engine):
+    with engine.connect() as conn:
+        result = conn.execute(select(*PRODUCT_COLUMNS))
+        return [dict(row) for row in result.mappings()]
+
+
+def measure(label, fn, engine):
+    fn(engine)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(engine)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<6} {ROWS * ROUNDS / elapsed:12,.0f} rows/s"
+        f" {peak / 1024 / 1024:8.1f} MiB peak"
+    )
+
+
+def main():
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "id": f"product-{i}",
+                    "name": f"Product {i}",
+                    "description": "A product description " * 4,
+                    "price": Decimal("9.99"),
+                    "category": "general",
+                    "created_at": now,
+                    "updated_at": now,
+                    "deleted": False,
+                }
+                for i in range(ROWS)
+            ],
+        )
+    measure("orm", orm_path, engine)
+    measure("core", core_path, engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Round trips and latency per read: transactional get_session vs autocommit
+# get_read_session. Needs ASYNCPG_URL to point at a reachable Postgres.
+# Run with: python -m benchmarks.bench_read_session
+import asyncio
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from config import settings
+from model.db import engine, get_read_session, get_session
+from model.queries import USER_BY_EMAIL
+
+N = 2000
+round_trips = Counter()
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def log_control_statements(dbapi_connection, connection_record):
+    # BEGIN / COMMIT / pings go through asyncpg's query logger
+    dbapi_connection.driver_connection.add_query_logger(
+        lambda record: round_trips.update([record.query.split()[0].upper()])
+    )
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def count_statements(conn, cursor, statement, parameters, context, executemany):
+    round_trips.update(["STATEMENT"])
+
+
+async def measure(label, session_factory):
+    params = {"email": settings.SUPERUSER_EMAIL}
+    async with session_factory() as session:
+        await session.execute(USER_BY_EMAIL, params)
+    round_trips.clear()
+    start = time.perf_counter()
+    for _ in range(N):
+        async with session_factory() as session:
+            (await session.execute(USER_BY_EMAIL, params)).first()
+    elapsed = time.perf_counter() - start
+    per_request = {name: count / N for name, count in sorted(round_trips.items())}
+    print(f"{label:<18} {elapsed / N * 1e6:8.1f} us/request  {per_request}")
+
+
+async def main():
+    try:
+        await measure("get_session", get_session)
+        await measure("get_read_session", get_read_session)
+    except Exception as e:
+        print(f"skipped, Postgres not reachable: {e}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+# Product search latency at 1M products: the indexed full-text and trigram
+# search behind GET /products/search vs an unindexed ILIKE scan. Seeds rows with
+# ids "search-bench-*" on first run. Needs ASYNCPG_URL to point at a reachable
+# Postgres migrated to head. Run with: python -m benchmarks.bench_search
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import func, or_, select, text
+
+from model.db import Product, engine, get_read_session, get_session
+from model.queries import PRODUCT_COLUMNS
+from model.read import search_products
+
+PRODUCTS = 1_000_000
+SEED_BATCH = 100_000
+RUNS = 50
+LIMIT = 21
+WORDS = (
+    "acoustic adjustable aluminium ambient backpack bamboo battery blender bottle "
+    "cable camera canvas ceramic charger classic compact cordless cotton cushion "
+    "desk digital drill electric ergonomic espresso foldable frame glass grinder "
+    "headphones heater kettle keyboard lamp leather lightweight linen marble "
+    "mattress microphone mirror monitor mug organic outdoor pillow portable "
+    "premium projector rechargeable router scanner shelf speaker stainless "
+    "stand steel table tablet thermal tripod vacuum vintage wireless wooden"
+).split()
+
+SEED = text(
+    """
+    INSERT INTO products
+        (id, name, description, price, category, created_at, updated_at, deleted)
+    SELECT
+        'search-bench-' || n,
+        w[1 + (random() * (cardinality(w) - 1))::int] || ' '
+            || w[1 + (random() * (cardinality(w) - 1))::int]
+            || CASE WHEN n % 10000 = 0 THEN ' zephyr' ELSE '' END,
+        w[1 + (random() * (cardinality(w) - 1))::int] || ' '
+            || w[1 + (random() * (cardinality(w) - 1))::int] || ' '
+            || w[1 + (random() * (cardinality(w) - 1))::int] || ' '
+            || w[1 + (random() * (cardinality(w) - 1))::int],
+        (random() * 100)::numeric(10, 2),
+        'category-' || n % 20,
+        now(),
+        now(),
+        false
+    FROM generate_series(:start, :stop) AS n,
+        (SELECT CAST(:words AS text[]) AS w) AS vocab
+    ON CONFLICT (id) DO NOTHING
+    """
+)
+
+
+async def seed():
+    async with get_read_session() as session:
+        seeded = (
+            await session.execute(
+                select(func.count()).where(Product.id.like("search-bench-%"))
+            )
+        ).scalar_one()
+    for start in range(seeded + 1, PRODUCTS + 1, SEED_BATCH):
+        stop = min(start + SEED_BATCH - 1, PRODUCTS)
+        async with get_session() as session:
+            await session.execute(
+                SEED, {"start": start, "stop": stop, "words": list(WORDS)}
+            )
+        print(f"seeded {stop} products")
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE products"))
+
+
+async def ilike(q: str, limit: int):
+    pattern = f"%{q}%"
+    stmt = (
+        select(*PRODUCT_COLUMNS)
+        .where(
+            Product.deleted == False,
+            or_(Product.name.ilike(pattern), Product.description.ilike(pattern)),
+        )
+        .order_by(Product.id)
+        .limit(limit)
+    )
+    async with get_read_session() as session:
+        return (await session.execute(stmt)).all()
+
+
+async def measure(label, search, *args, **kwargs):
+    rows = await search(*args, **kwargs)
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await search(*args, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    p95 = statistics.quantiles(times, n=20)[18]
+    print(
+        f"{label:<24} median {statistics.median(times):8.2f}ms  "
+        f"p95 {p95:8.2f}ms  rows {len(rows)}"
+    )
+    return rows
+
+
+async def main():
+    try:
+        await seed()
+        await measure("ilike common", ilike, "wireless", LIMIT)
+        await measure("ilike rare", ilike, "zephyr", LIMIT)
+        rows = await measure("fts common", search_products, "wireless", LIMIT)
+        await measure("fts rare", search_products, "zephyr", LIMIT)
+        await measure("fts two words", search_products, "wireless speaker", LIMIT)
+        await measure(
+            "fts category",
+            search_products,
+            "wireless",
+            LIMIT,
+            categories=["category-3"],
+        )
+        await measure(
+            "fts next page",
+            search_products,
+            "wireless",
+            LIMIT,
+            after=(rows[-1]["rank"], rows[-1]["id"]),
+        )
+        await measure("fuzzy typo", search_products, "wireles", LIMIT, fuzzy=True)
+    except Exception as e:
+        print(f"skipped, Postgres not reachable: {e}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
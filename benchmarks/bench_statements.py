@@ -0,0 +1,82 @@
+# Per-query cost of prebuilt hot statements vs statements rebuilt per request.
+# The Python half runs on in-memory SQLite. The server half needs ASYNCPG_URL to
+# point at a reachable Postgres, and compares asyncpg prepared-statement caching
+# off vs on. Run with: python -m benchmarks.bench_statements
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import settings
+from model.db import Product, User
+from model.queries import PRODUCT_BY_ID, PRODUCT_COLUMNS, USER_BY_EMAIL
+
+N = 20000
+SERVER_N = 2000
+
+
+def per_query_us(fn, n=N):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def python_side():
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Product),
+            {"id": "p1", "name": "P", "price": 1, "created_at": now, "deleted": False},
+        )
+    with engine.connect() as conn:
+        rebuilt = per_query_us(
+            lambda: conn.execute(
+                select(*PRODUCT_COLUMNS).filter(
+                    Product.id == "p1", Product.deleted == False
+                )
+            ).first()
+        )
+        prebuilt = per_query_us(
+            lambda: conn.execute(PRODUCT_BY_ID, {"id": "p1"}).first()
+        )
+    print(f"product by id, rebuilt per request   {rebuilt:8.1f} us/query")
+    print(f"product by id, prebuilt statement    {prebuilt:8.1f} us/query")
+    print(f"python time saved                    {rebuilt - prebuilt:8.1f} us/query")
+
+
+async def server_side():
+    async def run(cache_size):
+        engine = create_async_engine(
+            settings.ASYNCPG_URL,
+            connect_args={"prepared_statement_cache_size": cache_size},
+        )
+        async with engine.connect() as conn:
+            params = {"email": settings.SUPERUSER_EMAIL}
+            await conn.execute(USER_BY_EMAIL, params)
+            start = time.perf_counter()
+            for _ in range(SERVER_N):
+                (await conn.execute(USER_BY_EMAIL, params)).first()
+            elapsed = time.perf_counter() - start
+        await engine.dispose()
+        return elapsed / SERVER_N * 1e6
+
+    try:
+        unprepared = await run(0)
+        prepared = await run(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)
+    except (OSError, Exception) as e:
+        print(f"server side skipped, Postgres not reachable: {e}")
+        return
+    print(f"user by email, no statement cache    {unprepared:8.1f} us/query")
+    print(f"user by email, prepared & cached     {prepared:8.1f} us/query")
+    print(f"round trip time saved                {unprepared - prepared:8.1f} us/query")
+
+
+if __name__ == "__main__":
+    python_side()
+    asyncio.run(server_side())
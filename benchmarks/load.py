@@ -0,0 +1,255 @@
+# In-process load test: drives the ASGI app from main.py with concurrent virtual
+# users against the database in ASYNCPG_URL. Run with ENV=local (so /user/token
+# skips Google) against a local Postgres after GET /reset_db, and LOG_LEVEL=WARNING
+# to keep logging out of the numbers. The harness undoes ENV=local's other effects,
+# SQL echo and unchecked access tokens, so those don't skew the numbers either.
+#
+#   python -m benchmarks.load --users 50 --requests 2000 --save benchmarks/baselines/local.json
+#   python -m benchmarks.load --users 50 --requests 2000 --check benchmarks/baselines/local.json
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from uuid import uuid4
+
+import httpx
+
+from api.auth import get_user_from_access_token, get_user_from_token
+from core.ratelimit import RateLimitMiddleware
+from main import app
+from model.db import engine, replica_engines
+
+SEED_PRODUCTS = 1000
+COMPANY_ID = 1
+
+
+def disable_rate_limits():
+    # Every virtual user shares one user id and client IP, so the limits meant for
+    # real clients would turn most requests into 429s. The app's middleware stack
+    # is built on the first request, so this still takes effect.
+    for middleware in app.user_middleware:
+        if middleware.cls is RateLimitMiddleware:
+            middleware.kwargs["limits"] = {}
+
+
+def match_production():
+    # ENV=local echoes every SQL statement to stdout and accepts any access token
+    # without decoding it. Production does neither, so neither belongs in a baseline.
+    for instrumented in (engine, *replica_engines):
+        instrumented.echo = False
+    app.dependency_overrides[get_user_from_token] = get_user_from_access_token
+
+
+def failed(response: httpx.Response) -> bool:
+    if response.status_code >= 400:
+        return True
+    # Handlers report failures as a returned HTTPException with a 200 status
+    body = response.json()
+    return isinstance(body, dict) and "status_code" in body and "detail" in body
+
+
+async def list_products(client, ctx):
+    return await client.get("/products/", params={"limit": 100}, headers=ctx["auth"])
+
+
+async def search_products(client, ctx):
+    return await client.get(
+        "/products/search", params={"q": "seed"}, headers=ctx["auth"]
+    )
+
+
+async def get_product(client, ctx):
+    id = random.choice(ctx["product_ids"])
+    return await client.get(f"/products/{id}", headers=ctx["auth"])
+
+
+async def create_product(client, ctx):
+    response = await client.post(
+        "/products/",
+        json={"name": "Load test", "description": "Load test", "price": "1"},
+        headers=ctx["auth"],
+    )
+    ctx["created_ids"].append(response.json()["data"]["product_id"])
+    return response
+
+
+async def update_product(client, ctx):
+    id = random.choice(ctx["product_ids"])
+    return await client.put(
+        f"/products/{id}", json={"name": f"Load test {id}"}, headers=ctx["auth"]
+    )
+
+
+async def delete_product(client, ctx):
+    id = ctx["created_ids"].pop() if ctx["created_ids"] else str(uuid4())
+    return await client.delete(f"/products/{id}", headers=ctx["auth"])
+
+
+async def token(client, ctx):
+    return await client.post("/user/token", json={"google_token": "load-test"})
+
+
+async def refresh(client, ctx):
+    # Refresh tokens rotate, so each one is used once and its successor goes back
+    # in the pool; replaying one would revoke its session
+    tokens = ctx["refresh_tokens"]
+    if tokens:
+        refresh_token = tokens.pop()
+    else:
+        refresh_token = (await token(client, ctx)).json()["refresh_token"]
+    response = await client.post(
+        "/user/refresh", headers={"Authorization": f"Bearer {refresh_token}"}
+    )
+    if response.status_code == 200 and "refresh_token" in response.json():
+        tokens.append(response.json()["refresh_token"])
+    return response
+
+
+async def get_company(client, ctx):
+    return await client.get(f"/company/{COMPANY_ID}", headers=ctx["auth"])
+
+
+async def update_company(client, ctx):
+    return await client.put(
+        f"/company/{COMPANY_ID}", json={"about": "Load test"}, headers=ctx["auth"]
+    )
+
+
+SCENARIOS = {
+    "list_products": list_products,
+    "search_products": search_products,
+    "get_product": get_product,
+    "create_product": create_product,
+    "update_product": update_product,
+    "delete_product": delete_product,
+    "token": token,
+    "refresh": refresh,
+    "get_company": get_company,
+    "update_company": update_company,
+}
+
+
+async def setup(client) -> dict:
+    # A real login, so requests carry the same tokens, session id included, as
+    # production clients do
+    tokens = (await token(client, {})).json()
+    ctx = {
+        "auth": {"Authorization": f"Bearer {tokens['access_token']}"},
+        "refresh_tokens": [],
+        "created_ids": [],
+    }
+    response = await client.post(
+        "/products/bulk",
+        json={
+            "products": [
+                {"name": f"Seed {i}", "description": "Seed", "price": "1"}
+                for i in range(SEED_PRODUCTS)
+            ]
+        },
+        headers=ctx["auth"],
+    )
+    ctx["product_ids"] = [row["product_id"] for row in response.json()["data"]]
+    return ctx
+
+
+async def run_scenario(client, ctx, fn, users: int, requests: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def virtual_user():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await fn(client, ctx)
+                errors += failed(response)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = (
+        statistics.quantiles(latencies, n=100)[i] * 1000 for i in (49, 94, 98)
+    )
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            found.append(f"{name}: {result['rps']:.0f} req/s vs {base['rps']:.0f}")
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(
+                f"{name}: p95 {result['p95_ms']:.1f}ms vs {base['p95_ms']:.1f}ms"
+            )
+    return found
+
+
+async def main(args):
+    results = {}
+    match_production()
+    if not args.rate_limits:
+        disable_rate_limits()
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load-test"
+        ) as client:
+            ctx = await setup(client)
+            for name in args.scenarios:
+                results[name] = await run_scenario(
+                    client, ctx, SCENARIOS[name], args.users, args.requests
+                )
+                r = results[name]
+                print(
+                    f"{name:<16} {r['rps']:8.0f} req/s  p50 {r['p50_ms']:7.1f}ms"
+                    f"  p95 {r['p95_ms']:7.1f}ms  p99 {r['p99_ms']:7.1f}ms"
+                    f"  errors {r['errors']}"
+                )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+    if args.check:
+        with open(args.check) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--check", help="Fail if results regress against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="Keep RATE_LIMITS on (all virtual users share one client key)",
+    )
+    asyncio.run(main(parser.parse_args()))
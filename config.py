@@ -2,6 +2,7 @@ from authlib.integrations.starlette_client import OAuth
 from dotenv import load_dotenv
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from starlette.config import Config
 
@@ -13,6 +14,7 @@ load_dotenv(verbose=True, override=True)
 class Settings(BaseSettings):
     ENV: str
     ASYNCPG_URL: str
+    ASYNCPG_REPLICA_URLS: str = ""
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     SLACK_ERROR_CHANNEL: str
@@ -26,10 +28,50 @@ class Settings(BaseSettings):
     API_SECRET_KEY: str
     FRONTEND_URL: str
     BASE_URL: str
+    PRODUCT_CACHE_SIZE: int = 10000
+    PRODUCT_CACHE_TTL_SECONDS: int = 60
+    TOKEN_CACHE_SIZE: int = 10000
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 30
+    WORKERS: int = 1
+    DB_CONNECTION_BUDGET: int = 40
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_QUERY_CACHE_SIZE: int = 1200
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 256
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    PROMETHEUS_MULTIPROC_DIR: str = ""
+    INVENTORY_RECONCILE_SECONDS: int = 5
+    ROLLUP_INTERVAL_SECONDS: int = 5
+    ROLLUP_BATCH_SIZE: int = 500
+    SESSION_REAP_INTERVAL_SECONDS: int = 300
+    SESSION_REAP_BATCH_SIZE: int = 1000
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_CACHE_SIZE: int = 256
+    COMPRESSION_CACHE_TTL_SECONDS: int = 300
+    LOG_LEVEL: str = "INFO"
+    LOG_ASYNC: bool = False
+    LOG_JSON: bool = False
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+    # "METHOD /route", "/route" or "*" -> (tokens per second, burst); empty disables
+    RATE_LIMITS: dict[str, tuple[float, int]] = {}
+    RATE_LIMIT_SHM_PATH: str = ""
+    RATE_LIMIT_SLOTS: int = 65536
     # AWS_ACCESS_KEY: str
     # AWS_SECRET_KEY: str
     # AWS_REGION: str
 
+    @field_validator("RATE_LIMITS")
+    @classmethod
+    def check_rate_limits(cls, limits):
+        # A zero rate never refills, and a bucket under one token never lets through
+        for route, (rate, burst) in limits.items():
+            if rate <= 0 or burst < 1:
+                raise ValueError(
+                    f"{route!r} needs a positive rate and a burst of at least 1"
+                )
+        return limits
+
 
 settings = Settings()
 app_logger = setup_logger(settings=settings)
@@ -0,0 +1,199 @@
+import gzip
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+
+from core.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone is still negotiated
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+GZIP_LEVEL = 6
+# Quality 4 is far cheaper than the default 11 and still smaller than gzip -6
+BROTLI_QUALITY = 4
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+CACHE_SCOPE_KEY = "compression.cache"
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    for coding in ENCODINGS:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Compresses a streamed body chunk by chunk, flushing so each chunk goes out."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (
+                self._compressor.finish() if final else self._compressor.flush()
+            )
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(
+            zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        )
+
+
+def cache_compressed(request: Request, cache: TTLCache):
+    """Opts this request's route in to caching its compressed 200s in cache.
+
+    Entries are keyed by (ETag, encoding) and never compared with the body, so the
+    route must clear cache whenever one of its ETags could be reused for new content.
+    """
+    request.scope[CACHE_SCOPE_KEY] = cache
+
+
+def is_compressible(start: dict, headers: Headers) -> bool:
+    return (
+        200 <= start["status"] < 300
+        and start["status"] != 204
+        and "content-encoding" not in headers
+        and "no-transform" not in headers.get("cache-control", "")
+        and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    """Negotiates br/gzip for bodies of at least minimum_size bytes.
+
+    Routes that opt in with cache_compressed have the compressed bodies of their 200s
+    cached by (ETag, encoding), so a large product list page is compressed once per
+    version instead of once per request.
+    """
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        responder = CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """Compresses one response. The first body chunk decides how it is sent."""
+
+    def __init__(self, middleware: CompressionMiddleware, scope, encoding: str, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start = None
+        # None until the first body chunk decides, then "identity" or "stream"
+        self.mode = None
+        self.compressor = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+        elif message["type"] != "http.response.body" or self.mode == "identity":
+            await self._send(message)
+        elif self.mode == "stream":
+            await self.send_chunk(message)
+        else:
+            await self.send_first(message)
+
+    async def send_chunk(self, message):
+        more_body = message.get("more_body", False)
+        body = self.compressor.compress(message.get("body", b""), final=not more_body)
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+    async def send_first(self, message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+        etag = headers.get("etag")
+        if self.start["status"] == 304 and etag and not etag.startswith("W/"):
+            # Match the weakened ETag the full response was sent with
+            headers["ETag"] = f"W/{etag}"
+        if not is_compressible(self.start, headers) or (
+            not more_body and len(body) < self.middleware.minimum_size
+        ):
+            self.mode = "identity"
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if etag and not etag.startswith("W/"):
+            # The compressed bytes differ from the identity ones
+            headers["ETag"] = f"W/{etag}"
+        if more_body:
+            await self.start_stream(headers, body)
+        else:
+            await self.send_whole(headers, etag, body)
+
+    async def start_stream(self, headers: MutableHeaders, body: bytes):
+        self.mode = "stream"
+        self.compressor = StreamCompressor(self.encoding)
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        await self._send(self.start)
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": self.compressor.compress(body, final=False),
+                "more_body": True,
+            }
+        )
+
+    async def send_whole(self, headers: MutableHeaders, etag, body: bytes):
+        # The route sets the cache while handling the request, i.e. before this runs
+        cache = self.scope.get(CACHE_SCOPE_KEY)
+        cached = cache is not None and etag and self.start["status"] == 200
+        key = (etag, self.encoding) if cached else None
+        data = cache.get(key) if key else None
+        if data is None:
+            data = compress(body, self.encoding)
+            if key:
+                cache.set(key, data)
+        headers["Content-Length"] = str(len(data))
+        self.mode = "identity"
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": data})
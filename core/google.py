@@ -0,0 +1,87 @@
+import asyncio
+import re
+import time
+
+import aiohttp
+from google.auth import jwt as google_jwt
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+DEFAULT_MAX_AGE_SECONDS = 300
+# Refresh in the background once this close to expiry so logins never wait on it
+REFRESH_MARGIN_SECONDS = 60
+MIN_REFETCH_INTERVAL_SECONDS = 30
+CLOCK_SKEW_SECONDS = 10
+
+
+def max_age(headers) -> int:
+    match = re.search(r"max-age=(\d+)", headers.get("Cache-Control", ""))
+    if not match:
+        return DEFAULT_MAX_AGE_SECONDS
+    return max(int(match.group(1)) - int(headers.get("Age", 0)), 0)
+
+
+class GoogleCerts:
+    def __init__(self, url: str):
+        self.url = url
+        self.certs: dict[str, str] = {}
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def fetch(self):
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=10)
+        ) as session:
+            async with session.get(self.url) as response:
+                response.raise_for_status()
+                certs = await response.json()
+                ttl = max_age(response.headers)
+        self.certs = certs
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at + ttl
+        self.fetches += 1
+
+    async def refresh(self, seen_expires_at: float):
+        async with self._lock:
+            # Skip if another caller refreshed while we waited for the lock
+            if self.expires_at == seen_expires_at:
+                await self.fetch()
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh(self.expires_at))
+
+    async def get(self) -> dict[str, str]:
+        remaining = self.expires_at - time.monotonic()
+        if not self.certs or remaining <= 0:
+            await self.refresh(self.expires_at)
+        elif remaining < REFRESH_MARGIN_SECONDS:
+            self._refresh_in_background()
+        return self.certs
+
+    def _decode(self, token: str, certs: dict, audience: str) -> dict:
+        return google_jwt.decode(
+            token,
+            certs=certs,
+            audience=audience,
+            clock_skew_in_seconds=CLOCK_SKEW_SECONDS,
+        )
+
+    async def verify(self, token: str, audience: str) -> dict:
+        certs = await self.get()
+        seen_expires_at = self.expires_at
+        try:
+            payload = await asyncio.to_thread(self._decode, token, certs, audience)
+        except ValueError as e:
+            # Google may rotate keys before our cached copy expires. Refetching is
+            # rate limited so forged key ids can't turn into a fetch storm.
+            stale = time.monotonic() - self.fetched_at > MIN_REFETCH_INTERVAL_SECONDS
+            if "Certificate for key id" not in str(e) or not stale:
+                raise
+            await self.refresh(seen_expires_at)
+            payload = await asyncio.to_thread(self._decode, token, self.certs, audience)
+        if payload["iss"] not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {payload['iss']}")
+        return payload
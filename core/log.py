@@ -1,13 +1,32 @@
 import os
+import random
 import sys
 from datetime import datetime, time
 
 from loguru import logger
+from starlette.routing import Match
 
 # from core.slack import send_error_to_slack, send_info_to_slack
 
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+)
+
+
+def utc_time(_):
+    return datetime.utcnow().time()
+
+
+def is_sampled(record) -> bool:
+    return record["extra"].get("sampled", True) or record["level"].no >= 30
+
 
 def setup_logger(log_folder="logs", settings=None):
+    log_level = getattr(settings, "LOG_LEVEL", "INFO")
+    # Sinks write from a background thread, which also runs rotation and compression
+    enqueue = getattr(settings, "LOG_ASYNC", False)
+    serialize = getattr(settings, "LOG_JSON", False)
+
     # Remove default logger
     logger.remove()
 
@@ -19,28 +38,37 @@ def setup_logger(log_folder="logs", settings=None):
     # Add file handler
     logger.add(
         log_file,
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
+        format=TEXT_FORMAT,
+        level=log_level,
+        filter=is_sampled,
         rotation=time(0, 0, 0),
         retention="30 days",
         compression="zip",
         encoding="utf-8",
+        enqueue=enqueue,
+        serialize=serialize,
     )
 
     # Add console handler with detailed exception formatting
     logger.add(
         sys.stderr,
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}\n{exception}",
+        format=TEXT_FORMAT + "\n{exception}",
         level="ERROR",
         backtrace=True,
         diagnose=True,
+        enqueue=enqueue,
+        serialize=serialize,
     )
 
     logger.add(
         sys.stdout,
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level="INFO",
+        format=TEXT_FORMAT,
+        level=log_level,
+        filter=is_sampled,
         backtrace=True,
         diagnose=True,
+        enqueue=enqueue,
+        serialize=serialize,
     )
 
     # try:
@@ -60,5 +88,30 @@ def setup_logger(log_folder="logs", settings=None):
     #     print(f"Error setting up Slack logging: {str(e)}")
 
     # Create and return the app_logger
-    app_logger = logger.bind(time=lambda _: datetime.utcnow().time())
+    app_logger = logger.bind(time=utc_time)
     return app_logger
+
+
+def route_template(scope) -> str:
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return scope["path"]
+
+
+class LogSamplingMiddleware:
+    """Keeps only a sample of sub-WARNING logs for the routes listed in rates."""
+
+    def __init__(self, app, rates: dict[str, float]):
+        self.app = app
+        self.rates = rates
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.rates:
+            return await self.app(scope, receive, send)
+        rate = self.rates.get(route_template(scope))
+        if rate is None or random.random() < rate:
+            return await self.app(scope, receive, send)
+        with logger.contextualize(sampled=False):
+            return await self.app(scope, receive, send)
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    values,
+)
+from sqlalchemy import event
+
+# prometheus_client turns on multiprocess mode whenever the variable exists, so an
+# empty value (say from .env) would write .db files into the working directory
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    values.ValueClass = values.get_value_class()
+
+POOL_STATS_INTERVAL_SECONDS = 5
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests in flight", multiprocess_mode="livesum"
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "DB statements executed per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50),
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent in DB statements per HTTP request",
+    ["route"],
+)
+POOL = Gauge(
+    "db_pool",
+    "Connection pool stats",
+    ["engine", "stat"],
+    multiprocess_mode="liveall",
+)
+
+# [statement count, seconds] for the current request
+_db_timing: ContextVar[list] = ContextVar("db_timing", default=None)
+
+
+# The start time lives on the statement's execution context, not the connection:
+# after_cursor_execute never fires for a statement that raises, and a per-connection
+# stack would keep its start and pair it with the next statement's end.
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    timing = _db_timing.get()
+    if timing is not None:
+        timing[0] += 1
+        timing[1] += elapsed
+
+
+def instrument_engine(engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+async def report_pool_stats(engines: dict):
+    while True:
+        for name, engine in engines.items():
+            for stat, value in engine.pool.snapshot().items():
+                POOL.labels(name, stat).set(value)
+        await asyncio.sleep(POOL_STATS_INTERVAL_SECONDS)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        timing = [0, 0.0]
+        _db_timing.set(timing)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            # Label by route template so /products/{id} is one series, not one per id
+            route = scope["route"].path if "route" in scope else "unmatched"
+            REQUESTS.labels(scope["method"], route, status).inc()
+            REQUEST_LATENCY.labels(scope["method"], route).observe(elapsed)
+            DB_QUERIES.labels(route).observe(timing[0])
+            DB_TIME.labels(route).observe(timing[1])
+
+
+def render_metrics(multiproc_dir: str) -> tuple[bytes, str]:
+    if multiproc_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
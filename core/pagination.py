@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    return _encode([created_at.isoformat(), id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, id = _decode(cursor)
+        return datetime.fromisoformat(created_at), id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def encode_rank_cursor(rank: float, id: str) -> str:
+    # JSON floats round-trip exactly, so the next page resumes at the same rank
+    return _encode([rank, id])
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        rank, id = _decode(cursor)
+        return float(rank), str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
@@ -0,0 +1,156 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Callable
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+# One bucket: key hash, tokens left, CLOCK_MONOTONIC of the last update. The
+# monotonic clock is system-wide on Linux, so every worker on a host agrees on it.
+SLOT = struct.Struct("<Qdd")
+# Buckets are found by probing a small group of slots under one byte-range lock,
+# so workers only contend when they hit the same group
+WAYS = 4
+EMPTY = 0
+
+
+def default_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "api-rate-limits")
+
+
+class SharedBuckets:
+    """Token buckets in a memory-mapped file shared by all workers on a host.
+
+    A key that can't find a free slot in its group takes over the one idle the
+    longest, which starts it with a full bucket. Size slots well above the number
+    of clients active within a refill period and that never limits anyone.
+    """
+
+    def __init__(self, path: str, slots: int):
+        self.groups = max(slots // WAYS, 1)
+        size = self.groups * WAYS * SLOT.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Every worker grows the file to the same size, so the race is harmless
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """Takes a token from key's bucket, else returns seconds until one refills."""
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "little") or 1
+        start = (hashed % self.groups) * WAYS * SLOT.size
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, WAYS * SLOT.size, start)
+        try:
+            now = time.monotonic()
+            offset, tokens, updated = None, float(burst), now
+            oldest, oldest_updated = start, math.inf
+            for i in range(WAYS):
+                at = start + i * SLOT.size
+                slot_key, slot_tokens, slot_updated = SLOT.unpack_from(self.map, at)
+                if slot_key == hashed:
+                    offset, tokens, updated = at, slot_tokens, slot_updated
+                    break
+                if slot_key == EMPTY:
+                    slot_updated = -math.inf
+                if slot_updated < oldest_updated:
+                    oldest, oldest_updated = at, slot_updated
+            if offset is None:
+                offset = oldest
+
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            SLOT.pack_into(self.map, offset, hashed, tokens, now)
+            return wait
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, WAYS * SLOT.size, start)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+class RateLimitMiddleware:
+    """Token-bucket limits per client and route, shared by all workers on a host.
+
+    limits maps "METHOD /route/template", "/route/template" or "*" to
+    (tokens per second, burst). Clients are keyed by the user id of a valid bearer
+    token, else by IP. Routes without a limit of their own share the "*" bucket.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: dict[str, tuple[float, int]],
+        path: str,
+        slots: int,
+        decode: Callable[[str], dict],
+    ):
+        self.app = app
+        self.limits = limits
+        self.decode = decode
+        self.buckets = SharedBuckets(path or default_path(), slots) if limits else None
+        self._templates: dict[str, str] = {}
+
+    def template(self, scope) -> str:
+        # Paths are memoized so the routes' regexes run once per distinct path
+        path = scope["path"]
+        template = self._templates.get(path)
+        if template is None:
+            template = path
+            for route in scope["app"].router.routes:
+                if route.path_regex.match(path):
+                    template = route.path
+                    break
+            if len(self._templates) >= 10000:
+                self._templates.clear()
+            self._templates[path] = template
+        return template
+
+    def client(self, scope) -> str:
+        authorization = Headers(scope=scope).get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                return f"user:{self.decode(token)['id']}"
+            except Exception:
+                pass
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.buckets is None:
+            return await self.app(scope, receive, send)
+        template = self.template(scope)
+        route = f"{scope['method']} {template}"
+        limit = self.limits.get(route)
+        if limit is None:
+            route = template
+            limit = self.limits.get(route)
+        if limit is None:
+            route = "*"
+            limit = self.limits.get(route)
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        rate, burst = limit
+        wait = self.buckets.take(f"{route}|{self.client(scope)}", rate, burst)
+        if not wait:
+            return await self.app(scope, receive, send)
+        response = JSONResponse(
+            {"detail": "Too many requests"},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+        await response(scope, receive, send)
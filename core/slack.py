@@ -1,34 +1,186 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Optional
+
 import aiohttp
 
+QUEUE_SIZE = 1000
+BATCH_SIZE = 20
+BATCH_WAIT_SECONDS = 1
+MIN_POST_INTERVAL_SECONDS = 1
+DEDUPE_WINDOW_SECONDS = 60
+DRAIN_TIMEOUT_SECONDS = 5
 
-async def send_slack_message(message: str, channel: str, webhook_url: str):
+
+async def post_slack_message(
+    session: aiohttp.ClientSession, message: str, channel: str, webhook_url: str
+):
     try:
         payload = {"text": message, "channel": "#" + channel}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(webhook_url, json=payload) as response:
-                if response.status != 200:
-                    print(f"Failed to send Slack message. Status: {response.status}")
-                else:
-                    print(f"Slack message sent successfully to {channel}")
+        async with session.post(webhook_url, json=payload) as response:
+            if response.status != 200:
+                print(f"Failed to send Slack message. Status: {response.status}")
+            else:
+                print(f"Slack message sent successfully to {channel}")
     except Exception as e:
         print(f"Error sending Slack message: {str(e)}")
 
 
+async def send_slack_message(message: str, channel: str, webhook_url: str):
+    async with aiohttp.ClientSession() as session:
+        await post_slack_message(session, message, channel, webhook_url)
+
+
+class SlackNotifier:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.session = None
+        self.dropped = 0
+        self._task = None
+        self._last_sent: dict[tuple, float] = {}
+        self._suppressed: Counter = Counter()
+        self._last_post: dict[str, float] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def notify(self, message: str, channel: str, webhook_url: str):
+        try:
+            self.queue.put_nowait((message, channel, webhook_url))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def start(self):
+        if self._task is None:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(limit=4),
+            )
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Dropping {self.queue.qsize()} Slack messages on shutdown")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        for (message, channel, webhook_url), count in self._suppressed.items():
+            await self._post(f"{message} (x{count} suppressed)", channel, webhook_url)
+        self._suppressed.clear()
+        await self.session.close()
+        self.session = None
+
+    async def _next_batch(self, timeout: Optional[float]) -> list:
+        try:
+            batch = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = time.monotonic() + BATCH_WAIT_SECONDS
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _dedupe(self, batch: list) -> dict:
+        now = time.monotonic()
+        counts = Counter(batch)
+        grouped = {}
+        for (message, channel, webhook_url), count in counts.items():
+            key = (message, channel, webhook_url)
+            last_sent = self._last_sent.get(key, float("-inf"))
+            if now - last_sent < DEDUPE_WINDOW_SECONDS:
+                self._suppressed[key] += count
+                continue
+            count += self._suppressed.pop(key, 0)
+            self._last_sent[key] = now
+            if count > 1:
+                message = f"{message} (x{count})"
+            grouped.setdefault((channel, webhook_url), []).append(message)
+        # Report what a burst suppressed once its window ends, even if the message
+        # never comes back
+        for key in list(self._suppressed):
+            if now - self._last_sent.get(key, float("-inf")) >= DEDUPE_WINDOW_SECONDS:
+                message, channel, webhook_url = key
+                count = self._suppressed.pop(key)
+                self._last_sent[key] = now
+                grouped.setdefault((channel, webhook_url), []).append(
+                    f"{message} (x{count} suppressed)"
+                )
+        self._last_sent = {
+            key: sent
+            for key, sent in self._last_sent.items()
+            if now - sent < DEDUPE_WINDOW_SECONDS
+        }
+        return grouped
+
+    def _flush_timeout(self) -> Optional[float]:
+        if not self._suppressed:
+            return None
+        first_due = min(self._last_sent.get(key, 0) for key in self._suppressed)
+        return max(first_due + DEDUPE_WINDOW_SECONDS - time.monotonic(), 0)
+
+    async def _post(self, text: str, channel: str, webhook_url: str):
+        wait = (
+            self._last_post.get(webhook_url, 0)
+            + MIN_POST_INTERVAL_SECONDS
+            - time.monotonic()
+        )
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_post[webhook_url] = time.monotonic()
+        await post_slack_message(self.session, text, channel, webhook_url)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch(self._flush_timeout())
+            try:
+                grouped = self._dedupe(batch)
+                for (channel, webhook_url), messages in grouped.items():
+                    await self._post("\n".join(messages), channel, webhook_url)
+            except Exception as e:
+                print(f"Error flushing Slack messages: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+notifier = SlackNotifier()
+
+
 async def send_error_to_slack(error_message: str):
     from config import settings
 
-    await send_slack_message(
-        f"[{settings.ENV}] Error: {error_message}",
-        settings.SLACK_ERROR_CHANNEL,
-        settings.SLACK_WEBHOOK_URL_ERROR,
-    )
+    message = f"[{settings.ENV}] Error: {error_message}"
+    if notifier.running:
+        notifier.notify(
+            message, settings.SLACK_ERROR_CHANNEL, settings.SLACK_WEBHOOK_URL_ERROR
+        )
+    else:
+        await send_slack_message(
+            message, settings.SLACK_ERROR_CHANNEL, settings.SLACK_WEBHOOK_URL_ERROR
+        )
 
 
 async def send_info_to_slack(info_message: str):
     from config import settings
 
-    await send_slack_message(
-        f"[{settings.ENV}] Info: {info_message}",
-        settings.SLACK_INFO_CHANNEL,
-        settings.SLACK_WEBHOOK_URL_INFO,
-    )
+    message = f"[{settings.ENV}] Info: {info_message}"
+    if notifier.running:
+        notifier.notify(
+            message, settings.SLACK_INFO_CHANNEL, settings.SLACK_WEBHOOK_URL_INFO
+        )
+    else:
+        await send_slack_message(
+            message, settings.SLACK_INFO_CHANNEL, settings.SLACK_WEBHOOK_URL_INFO
+        )
@@ -0,0 +1,23 @@
+# Loaded automatically by gunicorn from the working directory
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+# nginx on the host reaches the container from Docker's bridge networks. Trusting
+# its X-Forwarded-For there sets each request's client to the caller's real IP,
+# which per-IP rate limits key on; otherwise every caller shares the proxy's.
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1,172.16.0.0/12")
+
+
+def on_starting(server):
+    # Metric files from a previous run would otherwise be summed into this one
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
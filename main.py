@@ -1,21 +1,39 @@
+import asyncio
 import os
 import subprocess
 from datetime import datetime
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette import status
 from starlette.middleware import Middleware
 from starlette.middleware.sessions import SessionMiddleware
 
+from api.auth import decode_token, get_user_from_token, invalidate_users
 from api.auth import router as auth_router
+from api.orders import router as orders_router
 from api.products import router as products_router
 from api.settings import router as settings_router
 from config import app_logger, settings
-from model.db import Base, Company, User, engine, get_session
+from core.cache import cache_stats
+from core.compression import CompressionMiddleware
+from core.log import LogSamplingMiddleware
+from core.metrics import (
+    MetricsMiddleware,
+    instrument_engine,
+    render_metrics,
+    report_pool_stats,
+)
+from core.ratelimit import RateLimitMiddleware
+from core.slack import notifier
+from model.db import Base, Company, User, engine, get_session, replica_engines
+from model.inventory import reconcile_inventory
+from model.notify import listener
+from model.rollups import roll_up_forever
+from model.sessions import reap_sessions_forever
 
 load_dotenv(verbose=True, override=True)
 
@@ -35,20 +53,44 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 origins = [settings.FRONTEND_URL, "http://localhost:3000", "http://127.0.0.1:3000"]
 
+# Inside CORS, so preflights aren't counted and 429s still carry CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    limits=settings.RATE_LIMITS,
+    path=settings.RATE_LIMIT_SHM_PATH,
+    slots=settings.RATE_LIMIT_SLOTS,
+    decode=decode_token,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets frontend code read validators to send back as If-None-Match
+    expose_headers=["ETag", "Last-Modified"],
 )
 
 app.add_middleware(SessionMiddleware, secret_key=settings.API_SECRET_KEY)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+app.add_middleware(LogSamplingMiddleware, rates=settings.LOG_SAMPLE_RATES)
+app.add_middleware(MetricsMiddleware)
+
+engines = {"primary": engine}
+engines.update({f"replica_{i}": replica for i, replica in enumerate(replica_engines)})
+for instrumented in engines.values():
+    instrument_engine(instrumented)
 
 
 @app.on_event("startup")
 async def startup_event():
     app_logger.debug("Server Starting Up...")
+    await notifier.start()
+    await listener.start()
+    app.state.pool_stats_task = asyncio.create_task(report_pool_stats(engines))
+    app.state.reconcile_task = asyncio.create_task(reconcile_inventory())
+    app.state.rollup_task = asyncio.create_task(roll_up_forever())
+    app.state.session_reap_task = asyncio.create_task(reap_sessions_forever())
 
 
 @app.get("/")
@@ -57,6 +99,28 @@ async def health():
     return {"health": "ok"}
 
 
+@app.get("/cache")
+async def get_cache_stats(user=Depends(get_user_from_token)):
+    return {"message": "Cache stats retrieved successfully", "data": cache_stats()}
+
+
+@app.get("/metrics")
+async def metrics():
+    content, media_type = render_metrics(settings.PROMETHEUS_MULTIPROC_DIR)
+    return Response(content=content, media_type=media_type)
+
+
+@app.get("/pool")
+async def get_pool_stats(user=Depends(get_user_from_token)):
+    return {
+        "message": "Pool stats retrieved successfully",
+        "data": {
+            "primary": engine.pool.snapshot(),
+            "replicas": [replica.pool.snapshot() for replica in replica_engines],
+        },
+    }
+
+
 @app.get("/reset_db")
 async def reset_db():
     try:
@@ -112,7 +176,7 @@ async def reset_db():
             app_logger.error(f"Database backup failed: {result.stderr.decode()}")
             raise Exception(f"Database backup failed: {result.stderr.decode()}")
 
-        app_logger.info(f"Database backed up to {backup_path}")
+        app_logger.info("Database backed up to {}", backup_path)
 
         # Original reset code
         async with engine.begin() as conn:
@@ -145,6 +209,7 @@ async def reset_db():
                 created_at=now,
             )
             session.add(user)
+            await invalidate_users(session, [])
 
         app_logger.info("Database reset and initialized successfully")
         return {"message": "Database reset and initialized successfully"}
@@ -159,8 +224,16 @@ async def reset_db():
 @app.on_event("shutdown")
 async def shutdown_event():
     app_logger.debug("Server Shutting Down...")
+    app.state.pool_stats_task.cancel()
+    app.state.reconcile_task.cancel()
+    app.state.rollup_task.cancel()
+    app.state.session_reap_task.cancel()
+    await listener.stop()
+    await notifier.stop()
+    await app_logger.complete()
 
 
 app.include_router(products_router)
 app.include_router(auth_router)
 app.include_router(settings_router)
+app.include_router(orders_router)
@@ -0,0 +1,55 @@
+"""add partial indexes for soft delete
+
+Revision ID: 5c2e7a91d4b3
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2e7a91d4b3"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_products_active_created_at_id",
+            "products",
+            ["created_at", "id"],
+            postgresql_where=sa.text("deleted = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_sessions_active_user_id",
+            "sessions",
+            ["user_id"],
+            postgresql_where=sa.text("deleted = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_sessions_active_user_id",
+            table_name="sessions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_products_active_created_at_id",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,37 @@
+"""add product list version
+
+Revision ID: e28c4f1a7b65
+Revises: c71e5a0b9d24
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e28c4f1a7b65"
+down_revision: Union[str, None] = "c71e5a0b9d24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_list_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        "INSERT INTO product_list_version (id, version, updated_at) "
+        "SELECT 1, 1, coalesce(max(coalesce(updated_at, created_at)), "
+        "timezone('utc', now())) FROM products"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("product_list_version")
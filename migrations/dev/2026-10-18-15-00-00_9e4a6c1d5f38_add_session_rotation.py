@@ -0,0 +1,35 @@
+"""add session rotation
+
+Revision ID: 9e4a6c1d5f38
+Revises: 3b9d7f2c8e51
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9e4a6c1d5f38"
+down_revision: Union[str, None] = "3b9d7f2c8e51"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "sessions",
+        sa.Column(
+            "used_rotations",
+            postgresql.ARRAY(sa.Integer()),
+            nullable=False,
+            server_default="{}",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sessions", "used_rotations")
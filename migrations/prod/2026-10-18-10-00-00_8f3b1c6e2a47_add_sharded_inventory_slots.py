@@ -0,0 +1,41 @@
+"""add sharded inventory slots
+
+Revision ID: 8f3b1c6e2a47
+Revises: 5c2e7a91d4b3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8f3b1c6e2a47"
+down_revision: Union[str, None] = "5c2e7a91d4b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "inventories",
+        sa.Column("sharded", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.create_table(
+        "inventory_slots",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("product_id", sa.String(), nullable=False),
+        sa.Column("slot", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("product_id", "slot"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("inventory_slots")
+    op.drop_column("inventories", "sharded")
@@ -0,0 +1,69 @@
+"""add daily sales rollups
+
+Revision ID: a4d9e2f7c318
+Revises: 8f3b1c6e2a47
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d9e2f7c318"
+down_revision: Union[str, None] = "8f3b1c6e2a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing orders start out pending, so the rollup task folds them in
+    op.add_column(
+        "sales_orders",
+        sa.Column("rolled_up", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.create_table(
+        "daily_product_sales",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.String(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.BigInteger(), nullable=False),
+        sa.Column("revenue", sa.DECIMAL(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "product_id"),
+    )
+    op.create_table(
+        "daily_customer_sales",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("customer_id", sa.Integer(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.DECIMAL(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["customer_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("day", "customer_id"),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sales_orders_pending_rollup",
+            "sales_orders",
+            ["id"],
+            postgresql_where=sa.text("rolled_up = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_sales_orders_pending_rollup",
+            table_name="sales_orders",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table("daily_customer_sales")
+    op.drop_table("daily_product_sales")
+    op.drop_column("sales_orders", "rolled_up")
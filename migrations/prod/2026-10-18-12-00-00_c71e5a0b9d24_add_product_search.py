@@ -0,0 +1,82 @@
+"""add product search
+
+Revision ID: c71e5a0b9d24
+Revises: a4d9e2f7c318
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c71e5a0b9d24"
+down_revision: Union[str, None] = "a4d9e2f7c318"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Adding a stored generated column rewrites products under an exclusive lock
+    op.add_column(
+        "products",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR, persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_products_active_search_vector",
+            "products",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_where=sa.text("deleted = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_products_active_name_trgm",
+            "products",
+            ["name"],
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=sa.text("deleted = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_products_active_category",
+            "products",
+            ["category"],
+            postgresql_where=sa.text("deleted = false"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index in (
+            "ix_products_active_category",
+            "ix_products_active_name_trgm",
+            "ix_products_active_search_vector",
+        ):
+            op.drop_index(
+                index,
+                table_name="products",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column("products", "search_vector")
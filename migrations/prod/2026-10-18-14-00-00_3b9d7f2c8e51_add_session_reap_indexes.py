@@ -0,0 +1,53 @@
+"""add session reap indexes
+
+Revision ID: 3b9d7f2c8e51
+Revises: e28c4f1a7b65
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d7f2c8e51"
+down_revision: Union[str, None] = "e28c4f1a7b65"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sessions_login_time",
+            "sessions",
+            ["login_time"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_sessions_deleted_id",
+            "sessions",
+            ["id"],
+            postgresql_where=sa.text("deleted = true"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_sessions_deleted_id",
+            table_name="sessions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_sessions_login_time",
+            table_name="sessions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
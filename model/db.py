@@ -1,29 +1,54 @@
+import itertools
+import time
 from contextlib import asynccontextmanager
-from datetime import time
+from contextvars import ContextVar
 from functools import partial
 from typing import AsyncGenerator
 
 from sqlalchemy import (
+    DDL,
     DECIMAL,
+    BigInteger,
     Boolean,
     Column,
+    Computed,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     Time,
+    UniqueConstraint,
+    event,
 )
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import deferred, relationship, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from config import app_logger, settings
 
 Base = declarative_base()
 NotNullColumn = partial(Column, nullable=False)
 
+# Trigram indexes need the extension before create_all builds them
+event.listen(
+    Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+
+SEARCH_CONFIG = "english"
+# Name matches outrank category matches, which outrank description matches
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(category, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')"
+)
+
 
 class Company(Base):
     __tablename__ = "companies"
@@ -59,10 +84,21 @@ class Session(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = NotNullColumn(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     login_time = NotNullColumn(DateTime)
+    # Rotations whose refresh token was already exchanged; presenting one again
+    # is a replay. A set rather than a counter, since rotations can be recorded
+    # out of order by different workers.
+    used_rotations = NotNullColumn(ARRAY(Integer), server_default="{}")
     deleted = NotNullColumn(Boolean, default=False)
 
     user = relationship("User", back_populates="sessions")
 
+    __table_args__ = (
+        Index("ix_sessions_active_user_id", user_id, postgresql_where=deleted == False),
+        # Let the reaper find expired rows and workers load revoked ones
+        Index("ix_sessions_login_time", login_time),
+        Index("ix_sessions_deleted_id", id, postgresql_where=deleted == True),
+    )
+
 
 class Product(Base):
     __tablename__ = "products"
@@ -74,6 +110,8 @@ class Product(Base):
     created_at = NotNullColumn(DateTime)
     updated_at = Column(DateTime)
     deleted = Column(Boolean, default=False)
+    # Maintained by Postgres; deferred so ORM loads of products never fetch it
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR, persisted=True)))
 
     inventory = relationship(
         "Inventory",
@@ -85,6 +123,43 @@ class Product(Base):
         "OrderItem", back_populates="product", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index(
+            "ix_products_active_created_at_id",
+            created_at,
+            id,
+            postgresql_where=deleted == False,
+        ),
+        Index(
+            "ix_products_active_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=deleted == False,
+        ),
+        Index(
+            "ix_products_active_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=deleted == False,
+        ),
+        Index(
+            "ix_products_active_category",
+            category,
+            postgresql_where=deleted == False,
+        ),
+    )
+
+
+class ProductListVersion(Base):
+    # One row, bumped inside every product write's transaction. Its change becomes
+    # visible exactly when the write commits, unlike app-side updated_at stamps,
+    # which commit out of order and skew between nodes.
+    __tablename__ = "product_list_version"
+    id = Column(Integer, primary_key=True)
+    version = NotNullColumn(BigInteger)
+    updated_at = NotNullColumn(DateTime)
+
 
 class SalesOrder(Base):
     __tablename__ = "sales_orders"
@@ -94,7 +169,9 @@ class SalesOrder(Base):
     total_amount = Column(DECIMAL)
     status = NotNullColumn(
         String(255), default="pending"
-    )  # pending, processing, shipped, delivered
+    )  # pending, processing, shipped, delivered, cancelled
+    # False until the rollup task has added the order to the daily sales tables
+    rolled_up = NotNullColumn(Boolean, default=False)
     created_at = NotNullColumn(DateTime)
     updated_at = Column(DateTime)
     deleted = Column(Boolean, default=False)
@@ -104,6 +181,12 @@ class SalesOrder(Base):
         "OrderItem", back_populates="sales_order", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index(
+            "ix_sales_orders_pending_rollup", id, postgresql_where=rolled_up == False
+        ),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -127,6 +210,9 @@ class Inventory(Base):
         String, ForeignKey("products.id", ondelete="CASCADE"), unique=True
     )
     quantity_in_stock = NotNullColumn(Integer, default=0)
+    # When sharded, stock is reserved from inventory_slots and quantity_in_stock is
+    # the total the reconciler folds back from them
+    sharded = NotNullColumn(Boolean, default=False)
     last_stock_update = Column(DateTime)
     created_at = NotNullColumn(DateTime)
     updated_at = Column(DateTime)
@@ -135,14 +221,128 @@ class Inventory(Base):
     product = relationship("Product", back_populates="inventory")
 
 
-engine = create_async_engine(
-    settings.ASYNCPG_URL,
-    future=True,
-    echo=True,
-    pool_size=20,
-    max_overflow=10,
-    connect_args={"server_settings": {"statement_timeout": "10000"}},
-)
+class InventorySlot(Base):
+    __tablename__ = "inventory_slots"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = NotNullColumn(String, ForeignKey("products.id", ondelete="CASCADE"))
+    slot = NotNullColumn(Integer)
+    quantity = NotNullColumn(Integer, default=0)
+    updated_at = Column(DateTime)
+
+    __table_args__ = (UniqueConstraint(product_id, slot),)
+
+
+class DailyProductSales(Base):
+    __tablename__ = "daily_product_sales"
+    day = Column(Date, primary_key=True)
+    product_id = Column(
+        String, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    orders = NotNullColumn(Integer, default=0)
+    quantity = NotNullColumn(BigInteger, default=0)
+    revenue = NotNullColumn(DECIMAL, default=0)
+    updated_at = Column(DateTime)
+
+
+class DailyCustomerSales(Base):
+    __tablename__ = "daily_customer_sales"
+    day = Column(Date, primary_key=True)
+    customer_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    orders = NotNullColumn(Integer, default=0)
+    revenue = NotNullColumn(DECIMAL, default=0)
+    updated_at = Column(DateTime)
+
+
+class PoolStats:
+    def __init__(self):
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "waits": self.stats.waits,
+            "avg_wait_ms": self.stats.wait_seconds / max(self.stats.waits, 1) * 1000,
+            "max_wait_ms": self.stats.max_wait_seconds * 1000,
+            "timeouts": self.stats.timeouts,
+        }
+
+
+# Each worker's PgListener (model/notify.py) keeps one connection to the primary
+# open outside its pool
+LISTEN_CONNECTIONS = 1
+
+
+def pool_sizes(reserved: int = 0) -> tuple[int, int]:
+    # Every gunicorn worker holds its own pool, so split the host's budget, less the
+    # connections each worker holds outside the pool
+    per_worker = max(settings.DB_CONNECTION_BUDGET // settings.WORKERS - reserved, 2)
+    max_overflow = per_worker // 3
+    return per_worker - max_overflow, max_overflow
+
+
+def make_engine(url: str, reserved: int = 0):
+    pool_size, max_overflow = pool_sizes(reserved)
+    return create_async_engine(
+        url,
+        future=True,
+        echo=settings.ENV == "local",
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args={
+            "server_settings": {"statement_timeout": "10000"},
+            # Per-connection LRU of asyncpg prepared statements. Set it to 0
+            # behind a transaction-pooling pgbouncer.
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+engine = make_engine(settings.ASYNCPG_URL, reserved=LISTEN_CONNECTIONS)
+replica_engines = [
+    make_engine(url.strip())
+    for url in settings.ASYNCPG_REPLICA_URLS.split(",")
+    if url.strip()
+]
 async_session = sessionmaker(
     engine,
     expire_on_commit=False,
@@ -151,9 +351,69 @@ async_session = sessionmaker(
     autoflush=False,
 )
 
+REPLICA_RETRY_SECONDS = 30
+_next_replica = itertools.count()
+_replica_down_until = {}
+# Set once a request opens a write session, so its later reads see its own writes
+_used_primary = ContextVar("used_primary", default=False)
+
+
+def read_variants(base_engine) -> dict:
+    # Autocommit sends each statement on its own, with no BEGIN/COMMIT round trips.
+    # Snapshot reads share one BEGIN READ ONLY transaction, which server-side
+    # cursors need.
+    return {
+        False: base_engine.execution_options(isolation_level="AUTOCOMMIT"),
+        True: base_engine.execution_options(postgresql_readonly=True),
+    }
+
+
+primary_reads = read_variants(engine)
+replica_reads = {replica: read_variants(replica) for replica in replica_engines}
+
+
+def read_engines() -> list:
+    if _used_primary.get() or not replica_engines:
+        return []
+    start = next(_next_replica) % len(replica_engines)
+    now = time.monotonic()
+    return [
+        replica
+        for replica in replica_engines[start:] + replica_engines[:start]
+        if _replica_down_until.get(replica, 0) <= now
+    ]
+
+
+async def open_read_session(
+    snapshot: bool = False, primary: bool = False
+) -> AsyncSession:
+    for replica in [] if primary else read_engines():
+        session = async_session(bind=replica_reads[replica][snapshot])
+        try:
+            await session.connection()
+            return session
+        except (SQLAlchemyError, OSError) as ex:
+            await session.close()
+            _replica_down_until[replica] = time.monotonic() + REPLICA_RETRY_SECONDS
+            app_logger.warning("Replica {} unavailable: {}", replica.url, ex)
+    return async_session(bind=primary_reads[snapshot])
+
+
+@asynccontextmanager
+async def get_read_session(
+    snapshot: bool = False, primary: bool = False
+) -> AsyncGenerator[AsyncSession, None]:
+    async with await open_read_session(snapshot, primary) as session:
+        try:
+            yield session
+        except SQLAlchemyError as ex:
+            app_logger.debug("Read session failed...")
+            raise ex
+
 
 @asynccontextmanager
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    _used_primary.set(True)
     async with async_session() as session:
         async with session.begin():
             try:
@@ -0,0 +1,127 @@
+# Stock reservation for both inventory modes. Single-row products reserve with
+# one conditional UPDATE on inventories. Sharded products spread their stock
+# over inventory_slots rows so a flash sale on one SKU isn't serialized on a
+# single row lock; the reconciler folds the slots back into quantity_in_stock.
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+
+from config import app_logger, settings
+from model import queries
+from model.db import Inventory, InventorySlot, get_read_session, get_session
+
+# Hint for which path to try first; the other path is still tried on a miss, so
+# a stale hint costs a round trip, never a wrongly rejected order
+sharded_products: set[str] = set()
+
+
+async def reserve_row(session, product_id, quantity, now) -> Optional[Decimal]:
+    params = {"product_id": product_id, "quantity": quantity, "now": now}
+    return (await session.execute(queries.RESERVE_STOCK, params)).scalar_one_or_none()
+
+
+async def reserve_slots(session, product_id, quantity, now) -> Optional[Decimal]:
+    params = {"product_id": product_id, "quantity": quantity, "now": now}
+    price = (await session.execute(queries.RESERVE_SLOT, params)).scalar_one_or_none()
+    if price is not None:
+        return price
+
+    # Every slot with enough stock is held by another buyer, or the stock is
+    # split so no single slot covers the order. Wait for all slots and drain them.
+    slots = (await session.execute(queries.LOCK_SLOTS, params)).all()
+    if not slots or sum(slot.quantity for slot in slots) < quantity:
+        return None
+    price = (
+        await session.execute(queries.ACTIVE_PRODUCT_PRICE, {"id": product_id})
+    ).scalar_one_or_none()
+    if price is None:
+        return None
+    drains = []
+    for slot in slots:
+        take = min(slot.quantity, quantity - sum(d["take"] for d in drains))
+        if take:
+            drains.append({"slot_id": slot.id, "take": take, "now": now})
+    await session.execute(queries.DRAIN_SLOT, drains)
+    return price
+
+
+async def reserve_stock(session, product_id, quantity, now) -> Optional[Decimal]:
+    """Takes quantity off the product's stock and returns its price, or None if short."""
+    attempts = (reserve_row, reserve_slots)
+    if product_id in sharded_products:
+        attempts = attempts[::-1]
+    for attempt in attempts:
+        price = await attempt(session, product_id, quantity, now)
+        if price is not None:
+            return price
+    return None
+
+
+async def shard_inventory(session, product_id: str, slots: int) -> Optional[int]:
+    """Moves a product's stock into slots rows, or back into one row if slots is 0.
+
+    Returns the product's stock, or None if it has no inventory row.
+    """
+    now = datetime.utcnow()
+    inventory = (
+        await session.execute(
+            select(Inventory)
+            .where(Inventory.product_id == product_id, Inventory.deleted == False)
+            .with_for_update()
+        )
+    ).scalar_one_or_none()
+    if inventory is None:
+        return None
+
+    total = inventory.quantity_in_stock
+    if inventory.sharded:
+        quantities = (
+            await session.execute(queries.LOCK_SLOTS, {"product_id": product_id})
+        ).scalars(1)
+        total = sum(quantities)
+        await session.execute(
+            delete(InventorySlot).where(InventorySlot.product_id == product_id)
+        )
+    if slots:
+        await session.execute(
+            insert(InventorySlot),
+            [
+                {
+                    "product_id": product_id,
+                    "slot": i,
+                    "quantity": total // slots + (i < total % slots),
+                    "updated_at": now,
+                }
+                for i in range(slots)
+            ],
+        )
+
+    inventory.sharded = bool(slots)
+    inventory.quantity_in_stock = total
+    inventory.last_stock_update = now
+    inventory.updated_at = now
+    if slots:
+        sharded_products.add(product_id)
+    else:
+        sharded_products.discard(product_id)
+    return total
+
+
+async def reconcile_inventory():
+    while True:
+        try:
+            now = datetime.utcnow()
+            async with get_session() as session:
+                await session.execute(queries.REBALANCE_SLOTS, {"now": now})
+                await session.execute(queries.FOLD_SLOTS, {"now": now})
+            async with get_read_session() as session:
+                result = await session.execute(queries.SHARDED_PRODUCT_IDS)
+                ids = result.scalars().all()
+                sharded_products.clear()
+                sharded_products.update(ids)
+        except Exception as e:
+            app_logger.warning(f"Inventory reconcile failed: {e}")
+        await asyncio.sleep(settings.INVENTORY_RECONCILE_SECONDS)
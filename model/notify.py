@@ -0,0 +1,77 @@
+import asyncio
+from typing import Callable
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import app_logger, settings
+
+RECONNECT_DELAY_SECONDS = 5
+
+
+class PgListener:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.callbacks: dict[str, list[Callable[[str], None]]] = {}
+        self._task = None
+        self._stopped = asyncio.Event()
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        self.callbacks.setdefault(channel, []).append(callback)
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for callback in self.callbacks.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                app_logger.exception(f"Error handling notification on {channel}: {e}")
+
+    async def _run(self):
+        while not self._stopped.is_set():
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except Exception as e:
+                app_logger.error(f"LISTEN connection failed: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                continue
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _, lost=lost: lost.set())
+            try:
+                for channel in self.callbacks:
+                    await connection.add_listener(channel, self._dispatch)
+                # Anything published while we were disconnected is lost, so
+                # subscribers are told to drop everything they hold.
+                for channel in self.callbacks:
+                    self._dispatch(connection, None, channel, "*")
+                app_logger.debug("Listening on {}", ", ".join(self.callbacks))
+                stop = asyncio.create_task(self._stopped.wait())
+                dropped = asyncio.create_task(lost.wait())
+                await asyncio.wait([stop, dropped], return_when=asyncio.FIRST_COMPLETED)
+                stop.cancel()
+                dropped.cancel()
+            except Exception as e:
+                app_logger.error(f"LISTEN connection error: {e}")
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+            if not self._stopped.is_set():
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def start(self):
+        if self.callbacks and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+async def publish(session: AsyncSession, channel: str, payload: str):
+    # Postgres delivers the notification only when the transaction commits
+    await session.execute(select(func.pg_notify(channel, payload)))
+
+
+listener = PgListener(settings.ASYNCPG_URL.replace("postgresql+asyncpg", "postgresql"))
@@ -1,5 +1,5 @@
 from datetime import datetime, time
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -25,3 +25,41 @@ class EditProductRequest(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     deleted: Optional[bool] = None
+
+
+class BulkProductItem(ProductRequest):
+    id: Optional[str] = None
+
+
+class BulkProductRequest(BaseModel):
+    products: List[BulkProductItem] = Field(..., min_length=1)
+
+
+class BulkEditProductItem(EditProductRequest):
+    id: str
+
+
+class BulkEditProductRequest(BaseModel):
+    products: List[BulkEditProductItem] = Field(..., min_length=1)
+
+
+class BulkDeleteProductRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1)
+
+
+class OrderItemRequest(BaseModel):
+    product_id: str
+    quantity: int = Field(..., gt=0)
+
+
+class OrderRequest(BaseModel):
+    items: List[OrderItemRequest] = Field(..., min_length=1)
+
+
+class InventorySlotsRequest(BaseModel):
+    # 0 moves the stock back into the single inventories row
+    slots: int = Field(..., ge=0, le=64)
+
+
+class OrderStatusRequest(BaseModel):
+    status: Literal["pending", "processing", "shipped", "delivered", "cancelled"]
@@ -0,0 +1,263 @@
+# Hot statements are built once at import. Each request only binds parameters,
+# which skips statement construction and cache-key generation, and the fixed SQL
+# text lets every pooled connection reuse its asyncpg prepared statement.
+from sqlalchemy import (
+    Integer,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model.db import (
+    Company,
+    Inventory,
+    InventorySlot,
+    Product,
+    ProductListVersion,
+    SalesOrder,
+    Session,
+    User,
+)
+
+# search_vector is only for matching and never sent to clients
+PRODUCT_COLUMNS = tuple(
+    column for column in Product.__table__.columns if column.name != "search_vector"
+)
+COMPANY_COLUMNS = tuple(Company.__table__.columns)
+USER_COLUMNS = tuple(User.__table__.columns)
+
+ACTIVE_PRODUCTS = (
+    select(*PRODUCT_COLUMNS)
+    .filter(Product.deleted == False)
+    .order_by(Product.created_at, Product.id)
+    .limit(bindparam("limit", type_=Integer))
+)
+ACTIVE_PRODUCTS_AFTER = ACTIVE_PRODUCTS.filter(
+    tuple_(Product.created_at, Product.id)
+    > tuple_(bindparam("created_at"), bindparam("id"))
+)
+PRODUCT_BY_ID = select(*PRODUCT_COLUMNS).filter(
+    Product.id == bindparam("id"), Product.deleted == False
+)
+COMPANY_BY_ID = select(*COMPANY_COLUMNS).filter(Company.id == bindparam("id"))
+
+# Freshness checks for conditional GETs. Every product write bumps the list's
+# version row in its own transaction, so the version changes whenever any list
+# page could. Its timestamp is taken from the database clock under the row lock
+# and never goes backwards.
+PRODUCTS_VERSION = select(
+    ProductListVersion.version, ProductListVersion.updated_at
+).where(ProductListVersion.id == 1)
+_bump = pg_insert(ProductListVersion).values(
+    id=1, version=1, updated_at=func.timezone("utc", func.clock_timestamp())
+)
+BUMP_PRODUCTS_VERSION = _bump.on_conflict_do_update(
+    index_elements=[ProductListVersion.id],
+    set_={
+        "version": ProductListVersion.version + 1,
+        "updated_at": func.greatest(
+            ProductListVersion.updated_at, _bump.excluded.updated_at
+        ),
+    },
+)
+PRODUCT_VERSION = select(func.coalesce(Product.updated_at, Product.created_at)).where(
+    Product.id == bindparam("id"), Product.deleted == False
+)
+COMPANY_VERSION = select(func.coalesce(Company.updated_at, Company.created_at)).where(
+    Company.id == bindparam("id")
+)
+USER_BY_EMAIL = select(*USER_COLUMNS).where(
+    User.email == bindparam("email"), User.deleted == False
+)
+INSERT_SESSION = (
+    insert(Session)
+    .values(user_id=bindparam("user_id"), login_time=bindparam("login_time"))
+    .returning(Session.id)
+)
+EXPIRE_SESSIONS = (
+    update(Session)
+    .where(Session.user_id == bindparam("user_id"), Session.deleted == False)
+    .values(deleted=True)
+    .returning(Session.id)
+)
+# Marks a rotation as used. Matching no row means the session is gone or the
+# rotation's refresh token was already exchanged, i.e. replayed.
+ROTATE_SESSION = (
+    update(Session)
+    .where(
+        Session.id == bindparam("id"),
+        Session.deleted == False,
+        ~(bindparam("rotation", type_=Integer) == any_(Session.used_rotations)),
+    )
+    .values(
+        used_rotations=func.array_append(
+            Session.used_rotations, bindparam("rotation", type_=Integer)
+        )
+    )
+    .returning(Session.id)
+)
+REVOKE_SESSION = (
+    update(Session)
+    .where(Session.id == bindparam("id"), Session.deleted == False)
+    .values(deleted=True)
+    .returning(Session.id)
+)
+REVOKED_SESSIONS = select(Session.id).where(
+    Session.deleted == True, Session.login_time >= bindparam("cutoff")
+)
+# A session is dead once its refresh token has expired. Revoked sessions are kept
+# until then because they are what workers load into their revocation sets.
+# Dead rows are deleted in small batches, and SKIP LOCKED lets every worker reap
+# without queueing behind another
+REAP_SESSIONS = delete(Session.__table__).where(
+    Session.id.in_(
+        select(Session.id)
+        .where(Session.login_time < bindparam("cutoff"))
+        .limit(bindparam("limit", type_=Integer))
+        .with_for_update(skip_locked=True)
+    )
+)
+
+# Reserve stock only if enough is left. The row lock is taken by the UPDATE itself,
+# so concurrent buyers of one SKU queue on it instead of racing a SELECT, and the
+# active product's price comes back in the same round trip.
+RESERVE_STOCK = (
+    # Core tables: the ORM bulk-update path mis-renders RETURNING from the FROM table
+    update(Inventory.__table__)
+    .where(
+        Inventory.product_id == bindparam("product_id"),
+        Inventory.quantity_in_stock >= bindparam("quantity", type_=Integer),
+        Inventory.deleted == False,
+        Inventory.sharded == False,
+        Product.id == Inventory.product_id,
+        Product.deleted == False,
+    )
+    .values(
+        quantity_in_stock=Inventory.quantity_in_stock
+        - bindparam("quantity", type_=Integer),
+        last_stock_update=bindparam("now"),
+        updated_at=bindparam("now"),
+    )
+    .returning(Product.__table__.c.price)
+)
+INSERT_ORDER = (
+    insert(SalesOrder)
+    .values(
+        customer_id=bindparam("customer_id"),
+        order_date=bindparam("now"),
+        status="pending",
+        rolled_up=False,
+        created_at=bindparam("now"),
+        updated_at=bindparam("now"),
+        deleted=False,
+    )
+    .returning(SalesOrder.id)
+)
+
+# Sharded inventory: take a random slot with enough stock, skipping slots other
+# buyers hold, so concurrent orders for one SKU spread over the slot rows
+RESERVE_SLOT = (
+    update(InventorySlot.__table__)
+    .where(
+        InventorySlot.id
+        == select(InventorySlot.id)
+        .where(
+            InventorySlot.product_id == bindparam("product_id"),
+            InventorySlot.quantity >= bindparam("quantity", type_=Integer),
+        )
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery(),
+        InventorySlot.quantity >= bindparam("quantity", type_=Integer),
+        Product.id == InventorySlot.product_id,
+        Product.deleted == False,
+    )
+    .values(
+        quantity=InventorySlot.quantity - bindparam("quantity", type_=Integer),
+        updated_at=bindparam("now"),
+    )
+    .returning(Product.__table__.c.price)
+)
+LOCK_SLOTS = (
+    select(InventorySlot.id, InventorySlot.quantity)
+    .where(InventorySlot.product_id == bindparam("product_id"))
+    .order_by(InventorySlot.slot)
+    .with_for_update()
+)
+DRAIN_SLOT = (
+    update(InventorySlot.__table__)
+    .where(InventorySlot.id == bindparam("slot_id"))
+    .values(
+        quantity=InventorySlot.quantity - bindparam("take", type_=Integer),
+        updated_at=bindparam("now"),
+    )
+)
+ACTIVE_PRODUCT_PRICE = select(Product.price).where(
+    Product.id == bindparam("id"), Product.deleted == False
+)
+SHARDED_PRODUCT_IDS = select(Inventory.product_id).where(Inventory.sharded == True)
+
+_slot_totals = (
+    select(InventorySlot.product_id, func.sum(InventorySlot.quantity).label("total"))
+    .group_by(InventorySlot.product_id)
+    .subquery()
+)
+FOLD_SLOTS = (
+    update(Inventory.__table__)
+    .where(
+        Inventory.product_id == _slot_totals.c.product_id,
+        Inventory.sharded == True,
+        Inventory.quantity_in_stock != _slot_totals.c.total,
+    )
+    .values(
+        quantity_in_stock=_slot_totals.c.total,
+        last_stock_update=bindparam("now"),
+        updated_at=bindparam("now"),
+    )
+)
+
+# Spread stock evenly again once a slot runs dry. Only slots no buyer holds are
+# locked and rebalanced among themselves, so this never waits on an order.
+_locked_slots = (
+    select(InventorySlot.id, InventorySlot.product_id, InventorySlot.quantity)
+    .where(
+        InventorySlot.product_id.in_(
+            select(InventorySlot.product_id)
+            .group_by(InventorySlot.product_id)
+            .having(func.min(InventorySlot.quantity) == 0)
+            .having(func.sum(InventorySlot.quantity) > 0)
+        )
+    )
+    .with_for_update(skip_locked=True)
+    .cte("locked_slots")
+)
+_shares = select(
+    _locked_slots.c.id,
+    func.sum(_locked_slots.c.quantity)
+    .over(partition_by=_locked_slots.c.product_id)
+    .label("total"),
+    func.count().over(partition_by=_locked_slots.c.product_id).label("n"),
+    (
+        func.row_number().over(
+            partition_by=_locked_slots.c.product_id, order_by=_locked_slots.c.id
+        )
+        - 1
+    ).label("i"),
+).cte("shares")
+REBALANCE_SLOTS = (
+    update(InventorySlot.__table__)
+    .where(InventorySlot.id == _shares.c.id)
+    .values(
+        quantity=_shares.c.total // _shares.c.n
+        + cast(_shares.c.i < _shares.c.total % _shares.c.n, Integer),
+        updated_at=bindparam("now"),
+    )
+)
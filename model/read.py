@@ -0,0 +1,184 @@
+from datetime import date, datetime
+from typing import AsyncGenerator, Optional
+
+from sqlalchemy import Integer, and_, bindparam, cast, func, or_, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from model.db import (
+    SEARCH_CONFIG,
+    DailyCustomerSales,
+    DailyProductSales,
+    Product,
+    get_read_session,
+)
+from model.queries import (
+    ACTIVE_PRODUCTS,
+    ACTIVE_PRODUCTS_AFTER,
+    COMPANY_BY_ID,
+    COMPANY_VERSION,
+    PRODUCT_BY_ID,
+    PRODUCT_COLUMNS,
+    PRODUCT_VERSION,
+    PRODUCTS_VERSION,
+)
+
+# Reads that fill a cache pass primary=True. A NOTIFY clears the caches right
+# after a write, and a lagging replica would refill them with the old rows (and
+# ETags) for the whole TTL.
+
+STREAM_PRODUCTS = (
+    select(*PRODUCT_COLUMNS)
+    .filter(Product.deleted == False)
+    .order_by(Product.created_at, Product.id)
+)
+
+
+async def fetch_products(
+    limit: int, after: Optional[tuple[datetime, str]] = None
+) -> list[dict]:
+    if after:
+        stmt = ACTIVE_PRODUCTS_AFTER
+        params = {"limit": limit, "created_at": after[0], "id": after[1]}
+    else:
+        stmt = ACTIVE_PRODUCTS
+        params = {"limit": limit}
+    async with get_read_session(primary=True) as session:
+        result = await session.execute(stmt, params)
+        return [dict(row) for row in result.mappings()]
+
+
+async def stream_products(batch_size: int) -> AsyncGenerator[list[dict], None]:
+    async with get_read_session(snapshot=True) as session:
+        result = await session.stream(
+            STREAM_PRODUCTS, execution_options={"yield_per": batch_size}
+        )
+        async for rows in result.mappings().partitions():
+            yield [dict(row) for row in rows]
+
+
+def search_statement(fuzzy: bool, categories: bool, after: bool):
+    q = bindparam("q")
+    tsquery = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), q)
+    match = Product.search_vector.op("@@")(tsquery)
+    rank = func.ts_rank_cd(Product.search_vector, tsquery)
+    if fuzzy:
+        # Trigram word similarity catches typos the stemmed full-text match misses
+        match = or_(match, q.op("<%")(Product.name))
+        rank = rank + func.word_similarity(q, Product.name)
+
+    stmt = select(*PRODUCT_COLUMNS, rank.label("rank")).where(
+        Product.deleted == False, match
+    )
+    if categories:
+        stmt = stmt.where(Product.category.in_(bindparam("categories", expanding=True)))
+    if after:
+        stmt = stmt.where(
+            or_(
+                rank < bindparam("rank"),
+                and_(rank == bindparam("rank"), Product.id > bindparam("id")),
+            )
+        )
+    return stmt.order_by(rank.desc(), Product.id).limit(
+        bindparam("limit", type_=Integer)
+    )
+
+
+# One prebuilt statement per combination of optional clauses
+SEARCH_PRODUCTS = {
+    (fuzzy, categories, after): search_statement(fuzzy, categories, after)
+    for fuzzy in (False, True)
+    for categories in (False, True)
+    for after in (False, True)
+}
+
+
+async def search_products(
+    q: str,
+    limit: int,
+    categories: Optional[list[str]] = None,
+    fuzzy: bool = False,
+    after: Optional[tuple[float, str]] = None,
+) -> list[dict]:
+    stmt = SEARCH_PRODUCTS[(fuzzy, bool(categories), bool(after))]
+    params = {"q": q, "limit": limit}
+    if categories:
+        params["categories"] = categories
+    if after:
+        params["rank"], params["id"] = after
+    async with get_read_session() as session:
+        result = await session.execute(stmt, params)
+        return [dict(row) for row in result.mappings()]
+
+
+async def fetch_product(id: str) -> Optional[dict]:
+    async with get_read_session(primary=True) as session:
+        row = (await session.execute(PRODUCT_BY_ID, {"id": id})).mappings().first()
+    return dict(row) if row else None
+
+
+async def fetch_products_version() -> tuple[int, Optional[datetime]]:
+    async with get_read_session(primary=True) as session:
+        row = (await session.execute(PRODUCTS_VERSION)).first()
+    # No row yet means no product was ever written
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+async def fetch_product_version(id: str) -> Optional[datetime]:
+    async with get_read_session() as session:
+        return (await session.execute(PRODUCT_VERSION, {"id": id})).scalar()
+
+
+async def fetch_company_version(company_id: int) -> Optional[datetime]:
+    async with get_read_session() as session:
+        return (await session.execute(COMPANY_VERSION, {"id": company_id})).scalar()
+
+
+async def fetch_company(company_id: int) -> Optional[dict]:
+    async with get_read_session() as session:
+        result = await session.execute(COMPANY_BY_ID, {"id": company_id})
+        row = result.mappings().first()
+    return dict(row) if row else None
+
+
+async def fetch_daily_sales(start: date, end: date) -> list[dict]:
+    stmt = (
+        select(
+            DailyCustomerSales.day,
+            func.sum(DailyCustomerSales.orders).label("orders"),
+            func.sum(DailyCustomerSales.revenue).label("revenue"),
+        )
+        .where(DailyCustomerSales.day.between(start, end))
+        .group_by(DailyCustomerSales.day)
+        .order_by(DailyCustomerSales.day)
+    )
+    async with get_read_session() as session:
+        result = await session.execute(stmt)
+        return [dict(row) for row in result.mappings()]
+
+
+async def fetch_product_sales(
+    start: date, end: date, product_id: Optional[str] = None
+) -> list[dict]:
+    stmt = select(*DailyProductSales.__table__.columns).where(
+        DailyProductSales.day.between(start, end), DailyProductSales.orders > 0
+    )
+    if product_id:
+        stmt = stmt.where(DailyProductSales.product_id == product_id)
+    stmt = stmt.order_by(DailyProductSales.day, DailyProductSales.product_id)
+    async with get_read_session() as session:
+        result = await session.execute(stmt)
+        return [dict(row) for row in result.mappings()]
+
+
+async def fetch_customer_sales(
+    start: date, end: date, customer_id: Optional[int] = None
+) -> list[dict]:
+    stmt = select(*DailyCustomerSales.__table__.columns).where(
+        DailyCustomerSales.day.between(start, end), DailyCustomerSales.orders > 0
+    )
+    if customer_id:
+        stmt = stmt.where(DailyCustomerSales.customer_id == customer_id)
+    stmt = stmt.order_by(DailyCustomerSales.day, DailyCustomerSales.customer_id)
+    async with get_read_session() as session:
+        result = await session.execute(stmt)
+        return [dict(row) for row in result.mappings()]
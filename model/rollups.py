@@ -0,0 +1,272 @@
+# Daily sales rollups. Orders are folded into daily_product_sales and
+# daily_customer_sales by a background task in batches, so placing an order never
+# waits on a shared rollup row. Status changes on orders that were already folded
+# in adjust the rollups in their own transaction.
+#
+# Rebuild everything from raw rows with: python -m model.rollups --days-per-batch 7
+# and compare the rollups against raw rows with: python -m model.rollups --check
+import argparse
+import asyncio
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import Date, cast, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+
+from config import app_logger, settings
+from model.db import (
+    DailyCustomerSales,
+    DailyProductSales,
+    OrderItem,
+    SalesOrder,
+    engine,
+    get_read_session,
+    get_session,
+)
+
+# Orders in these statuses don't count towards revenue
+UNCOUNTED_STATUSES = ("cancelled",)
+COUNTED = (SalesOrder.status.notin_(UNCOUNTED_STATUSES), SalesOrder.deleted == False)
+
+ORDER_DAY = cast(SalesOrder.order_date, Date)
+
+# Serialization failure and deadlock; the backfill batch is simply run again
+RETRYABLE_SQLSTATES = ("40001", "40P01")
+BACKFILL_ATTEMPTS = 5
+
+PENDING_ROLLUP = (
+    select(SalesOrder.id)
+    .where(SalesOrder.rolled_up == False)
+    .order_by(SalesOrder.id)
+    .limit(settings.ROLLUP_BATCH_SIZE)
+    .with_for_update(skip_locked=True)
+)
+
+
+def upsert_product_sales(where, now: datetime, sign: int = 1):
+    rows = (
+        select(
+            ORDER_DAY,
+            OrderItem.product_id,
+            sign * func.count(),
+            sign * func.sum(OrderItem.quantity),
+            sign * func.sum(OrderItem.price * OrderItem.quantity),
+            literal(now),
+        )
+        .join(SalesOrder, SalesOrder.id == OrderItem.order_id)
+        .where(*where, OrderItem.deleted == False)
+        .group_by(ORDER_DAY, OrderItem.product_id)
+        # Rows are locked in key order so concurrent batches can't deadlock
+        .order_by(ORDER_DAY, OrderItem.product_id)
+    )
+    stmt = pg_insert(DailyProductSales).from_select(
+        ["day", "product_id", "orders", "quantity", "revenue", "updated_at"], rows
+    )
+    table = DailyProductSales.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyProductSales.day, DailyProductSales.product_id],
+        set_={
+            "orders": table.orders + stmt.excluded.orders,
+            "quantity": table.quantity + stmt.excluded.quantity,
+            "revenue": table.revenue + stmt.excluded.revenue,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def upsert_customer_sales(where, now: datetime, sign: int = 1):
+    rows = (
+        select(
+            ORDER_DAY,
+            SalesOrder.customer_id,
+            sign * func.count(),
+            sign * func.coalesce(func.sum(SalesOrder.total_amount), 0),
+            literal(now),
+        )
+        .where(*where)
+        .group_by(ORDER_DAY, SalesOrder.customer_id)
+        .order_by(ORDER_DAY, SalesOrder.customer_id)
+    )
+    stmt = pg_insert(DailyCustomerSales).from_select(
+        ["day", "customer_id", "orders", "revenue", "updated_at"], rows
+    )
+    table = DailyCustomerSales.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyCustomerSales.day, DailyCustomerSales.customer_id],
+        set_={
+            "orders": table.orders + stmt.excluded.orders,
+            "revenue": table.revenue + stmt.excluded.revenue,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+async def roll_up_orders() -> int:
+    """Folds one batch of new orders into the rollups; returns how many it took."""
+    now = datetime.utcnow()
+    async with get_session() as session:
+        ids = (await session.execute(PENDING_ROLLUP)).scalars().all()
+        if not ids:
+            return 0
+        where = (SalesOrder.id.in_(ids), *COUNTED)
+        await session.execute(upsert_product_sales(where, now))
+        await session.execute(upsert_customer_sales(where, now))
+        await session.execute(
+            update(SalesOrder.__table__)
+            .where(SalesOrder.id.in_(ids))
+            .values(rolled_up=True)
+        )
+    return len(ids)
+
+
+async def roll_up_forever():
+    while True:
+        try:
+            # Drain the backlog before sleeping again
+            while await roll_up_orders() == settings.ROLLUP_BATCH_SIZE:
+                pass
+        except Exception as e:
+            app_logger.warning(f"Sales rollup failed: {e}")
+        await asyncio.sleep(settings.ROLLUP_INTERVAL_SECONDS)
+
+
+async def set_order_status(session, order: SalesOrder, status: str):
+    """Changes the status of a locked order, moving it in or out of the rollups."""
+    now = datetime.utcnow()
+    was_counted = order.status not in UNCOUNTED_STATUSES
+    counted = status not in UNCOUNTED_STATUSES
+    # Orders not rolled up yet are picked up later with their new status
+    if order.rolled_up and was_counted != counted:
+        where = (SalesOrder.id == order.id,)
+        sign = 1 if counted else -1
+        await session.execute(upsert_product_sales(where, now, sign))
+        await session.execute(upsert_customer_sales(where, now, sign))
+    order.status = status
+    order.updated_at = now
+
+
+async def rebuild_days(day, end):
+    now = datetime.utcnow()
+    where = (
+        SalesOrder.order_date >= datetime.combine(day, time()),
+        SalesOrder.order_date < datetime.combine(end, time()),
+    )
+    async with get_session() as session:
+        # One snapshot for the whole batch: orders placed after the UPDATE below
+        # stay invisible, so only the rollup task counts them. A conflicting
+        # concurrent write aborts the batch instead of being counted twice.
+        await session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        # Marking the orders first locks them, so the rollup task and status
+        # changes wait for this batch instead of racing the rebuild
+        await session.execute(
+            update(SalesOrder.__table__).where(*where).values(rolled_up=True)
+        )
+        for table in (DailyProductSales, DailyCustomerSales):
+            await session.execute(
+                delete(table).where(table.day >= day, table.day < end)
+            )
+        counted = (*where, *COUNTED, SalesOrder.rolled_up == True)
+        await session.execute(upsert_product_sales(counted, now))
+        await session.execute(upsert_customer_sales(counted, now))
+
+
+async def backfill(days_per_batch: int):
+    async with get_read_session() as session:
+        first, last = (
+            await session.execute(select(func.min(ORDER_DAY), func.max(ORDER_DAY)))
+        ).one()
+    if first is None:
+        return
+
+    day = first
+    while day <= last:
+        end = day + timedelta(days=days_per_batch)
+        for attempt in range(1, BACKFILL_ATTEMPTS + 1):
+            try:
+                await rebuild_days(day, end)
+                break
+            except DBAPIError as e:
+                sqlstate = getattr(e.orig, "sqlstate", None)
+                if sqlstate not in RETRYABLE_SQLSTATES or attempt == BACKFILL_ATTEMPTS:
+                    raise
+                app_logger.info("Retrying sales rollups from {} to {}", day, end)
+        app_logger.info("Rebuilt sales rollups from {} to {}", day, end)
+        day = end
+
+
+async def check_rollups() -> list[str]:
+    """Compares the rollups of folded-in orders against the raw rows, per day."""
+    folded = (*COUNTED, SalesOrder.rolled_up == True)
+    expected_orders = (
+        select(
+            ORDER_DAY,
+            func.count(),
+            func.coalesce(func.sum(SalesOrder.total_amount), 0),
+        )
+        .where(*folded)
+        .group_by(ORDER_DAY)
+    )
+    actual_orders = select(
+        DailyCustomerSales.day,
+        func.sum(DailyCustomerSales.orders),
+        func.sum(DailyCustomerSales.revenue),
+    ).group_by(DailyCustomerSales.day)
+    expected_items = (
+        select(
+            ORDER_DAY,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.price * OrderItem.quantity),
+        )
+        .join(SalesOrder, SalesOrder.id == OrderItem.order_id)
+        .where(*folded, OrderItem.deleted == False)
+        .group_by(ORDER_DAY)
+    )
+    actual_items = select(
+        DailyProductSales.day,
+        func.sum(DailyProductSales.quantity),
+        func.sum(DailyProductSales.revenue),
+    ).group_by(DailyProductSales.day)
+
+    mismatches = []
+    # Snapshot, so orders folded in between the queries can't look like drift
+    async with get_read_session(snapshot=True) as session:
+        for name, expected, actual in (
+            ("orders", expected_orders, actual_orders),
+            ("items", expected_items, actual_items),
+        ):
+            want = {row[0]: tuple(row[1:]) for row in await session.execute(expected)}
+            got = {
+                row[0]: tuple(row[1:])
+                for row in await session.execute(actual)
+                # Days whose orders were all cancelled later keep zeroed rows
+                if any(row[1:])
+            }
+            for day in sorted(want.keys() | got.keys()):
+                if want.get(day) != got.get(day):
+                    mismatches.append(
+                        f"{day} {name}: rollup {got.get(day)} vs raw {want.get(day)}"
+                    )
+    return mismatches
+
+
+async def main(args):
+    try:
+        if args.check:
+            mismatches = await check_rollups()
+            for mismatch in mismatches:
+                print(mismatch)
+            raise SystemExit(1 if mismatches else 0)
+        await backfill(args.days_per_batch)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups")
+    parser.add_argument("--days-per-batch", type=int, default=7)
+    parser.add_argument(
+        "--check", action="store_true", help="only compare rollups against raw rows"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+# Session lifecycle. Every login inserts a session, and refresh tokens carry the
+# session id ("sid") and a rotation counter ("rot"). Refreshing checks the token
+# against an in-process set of revoked sessions, kept in sync across workers and
+# nodes over LISTEN/NOTIFY, so minting tokens doesn't wait on the database. The
+# rotation is recorded afterwards in the background; replaying an already-rotated
+# refresh token revokes its whole session.
+#
+# Sessions are useless once their refresh token has expired, so a background
+# task deletes them in batches. Revoked sessions stay until then so a restarted
+# worker can load them back.
+import asyncio
+from datetime import datetime, timedelta
+
+from config import app_logger, settings
+from model import queries
+from model.db import get_session
+from model.notify import listener, publish
+
+SESSIONS_CHANNEL = "sessions_revoked"
+
+revoked_sessions: set[int] = set()
+# Keeps references to fire-and-forget rotations so they aren't collected mid-flight
+_background: set[asyncio.Task] = set()
+
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def is_revoked(payload: dict) -> bool:
+    return payload.get("sid") in revoked_sessions
+
+
+def session_login_time(payload: dict) -> datetime:
+    # Refresh tokens expire a fixed time after login, and rotations keep that expiry
+    return datetime.utcfromtimestamp(payload["exp"]) - timedelta(
+        minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
+    )
+
+
+def expiry_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+
+
+def on_sessions_revoked(payload: str):
+    if payload == "*":
+        # Revocations published while disconnected are lost, so reload them all
+        spawn(load_revoked_sessions())
+        return
+    revoked_sessions.update(int(id) for id in payload.split(","))
+
+
+listener.subscribe(SESSIONS_CHANNEL, on_sessions_revoked)
+
+
+async def load_revoked_sessions():
+    before = set(revoked_sessions)
+    try:
+        # The primary, so a revocation that was just committed can't be missed
+        async with get_session() as session:
+            result = await session.execute(
+                queries.REVOKED_SESSIONS, {"cutoff": expiry_cutoff()}
+            )
+            ids = result.scalars().all()
+    except Exception as e:
+        app_logger.warning(f"Loading revoked sessions failed: {e}")
+        return
+    # Replacing the set also drops sessions that have since expired
+    added = revoked_sessions - before
+    revoked_sessions.clear()
+    revoked_sessions.update(ids, added)
+
+
+async def revoke_sessions(session, ids):
+    if not ids:
+        return
+    revoked_sessions.update(ids)
+    await publish(session, SESSIONS_CHANNEL, ",".join(str(id) for id in ids))
+
+
+async def rotate_session(sid: int, rotation: int):
+    try:
+        async with get_session() as session:
+            result = await session.execute(
+                queries.ROTATE_SESSION, {"id": sid, "rotation": rotation}
+            )
+            if result.first() is not None:
+                return
+            result = await session.execute(queries.REVOKE_SESSION, {"id": sid})
+            ids = result.scalars().all()
+            if ids:
+                app_logger.warning("Refresh token reused, revoked session {}", sid)
+            await revoke_sessions(session, ids)
+    except Exception as e:
+        app_logger.warning(f"Session rotation failed: {e}")
+
+
+async def reap_sessions() -> int:
+    async with get_session() as session:
+        result = await session.execute(
+            queries.REAP_SESSIONS,
+            {"cutoff": expiry_cutoff(), "limit": settings.SESSION_REAP_BATCH_SIZE},
+        )
+    return result.rowcount
+
+
+async def reap_sessions_forever():
+    while True:
+        try:
+            reaped = 0
+            # One short transaction per batch keeps row locks brief
+            while True:
+                count = await reap_sessions()
+                reaped += count
+                if count < settings.SESSION_REAP_BATCH_SIZE:
+                    break
+            if reaped:
+                app_logger.info("Reaped {} sessions", reaped)
+        except Exception as e:
+            app_logger.warning(f"Session reap failed: {e}")
+        await load_revoked_sessions()
+        await asyncio.sleep(settings.SESSION_REAP_INTERVAL_SECONDS)
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 import requests
 
@@ -35,3 +37,46 @@ async def test_get_user(access_token):
     assert response.status_code == 200
     user_data = response.json()
     print(user_data)
+    for key in ("id", "email", "name", "company_id", "deleted"):
+        assert key in user_data
+
+
+def login():
+    # The Google token is only verified outside the local environment
+    response = requests.post(f"{BASE_URL}/token", json={"google_token": "local"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(refresh_token):
+    return requests.post(
+        f"{BASE_URL}/refresh", headers={"Authorization": f"Bearer {refresh_token}"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_token():
+    tokens = login()
+    response = refresh(tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    # Back-to-back refreshes record their rotations in any order
+    for _ in range(5):
+        response = refresh(rotated["refresh_token"])
+        assert response.status_code == 200
+        rotated = response.json()
+    time.sleep(1)
+    assert refresh(rotated["refresh_token"]).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_revokes_session():
+    tokens = login()
+    rotated = refresh(tokens["refresh_token"]).json()
+    refresh(tokens["refresh_token"])
+    # Reuse is detected when the rotation is recorded in the background
+    time.sleep(1)
+    response = refresh(rotated["refresh_token"])
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Session revoked"
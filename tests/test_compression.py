@@ -0,0 +1,42 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+from core.cache import TTLCache
+from core.compression import CompressionMiddleware, cache_compressed
+
+
+def make_app(cache):
+    app = FastAPI()
+    bodies = {"cached": "a" * 2000, "uncached": "b" * 2000}
+
+    @app.get("/{name}")
+    async def item(name: str, request: Request):
+        if name == "cached":
+            cache_compressed(request, cache)
+        return Response(bodies[name], media_type="text/plain", headers={"ETag": '"1"'})
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app, bodies
+
+
+async def get(client, path):
+    response = await client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == 'W/"1"'
+    return response.text
+
+
+@pytest.mark.asyncio
+async def test_only_opted_in_routes_are_cached():
+    cache = TTLCache("test_compressed", 16, 60)
+    app, bodies = make_app(cache)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert await get(client, "/cached") == bodies["cached"]
+        bodies["cached"] = bodies["uncached"] = "c" * 2000
+        # Same ETag, so the opted-in route serves its cached bytes until cleared
+        assert await get(client, "/cached") == "a" * 2000
+        assert await get(client, "/uncached") == "c" * 2000
+        cache.clear()
+        assert await get(client, "/cached") == "c" * 2000
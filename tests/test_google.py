@@ -0,0 +1,108 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+
+from core.google import GoogleCerts
+
+AUDIENCE = "test-client-id"
+
+
+def make_key(kid):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+    return crypt.RSASigner.from_string(private_pem, kid), cert_pem
+
+
+def make_token(signer, iss="https://accounts.google.com"):
+    now = int(time.time())
+    payload = {
+        "iss": iss,
+        "aud": AUDIENCE,
+        "email": "user@example.com",
+        "name": "Test User",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return google_jwt.encode(signer, payload).decode()
+
+
+@pytest_asyncio.fixture
+async def key_server(unused_tcp_port):
+    state = {"certs": {}, "requests": 0}
+
+    async def certs(request):
+        state["requests"] += 1
+        return web.json_response(
+            state["certs"], headers={"Cache-Control": "public, max-age=3600"}
+        )
+
+    app = web.Application()
+    app.router.add_get("/certs", certs)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", unused_tcp_port).start()
+    state["url"] = f"http://127.0.0.1:{unused_tcp_port}/certs"
+    yield state
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_verify_caches_certs(key_server):
+    signer, cert = make_key("key-1")
+    key_server["certs"] = {"key-1": cert}
+    google_certs = GoogleCerts(key_server["url"])
+
+    for _ in range(3):
+        payload = await google_certs.verify(make_token(signer), AUDIENCE)
+        assert payload["email"] == "user@example.com"
+    assert key_server["requests"] == 1
+
+
+@pytest.mark.asyncio
+async def test_verify_refetches_rotated_keys(key_server, monkeypatch):
+    old_signer, old_cert = make_key("key-1")
+    new_signer, new_cert = make_key("key-2")
+    key_server["certs"] = {"key-1": old_cert}
+    google_certs = GoogleCerts(key_server["url"])
+    await google_certs.verify(make_token(old_signer), AUDIENCE)
+
+    key_server["certs"] = {"key-2": new_cert}
+    monkeypatch.setattr("core.google.MIN_REFETCH_INTERVAL_SECONDS", 0)
+    payload = await google_certs.verify(make_token(new_signer), AUDIENCE)
+    assert payload["email"] == "user@example.com"
+    assert key_server["requests"] == 2
+
+
+@pytest.mark.asyncio
+async def test_verify_rejects_wrong_issuer(key_server):
+    signer, cert = make_key("key-1")
+    key_server["certs"] = {"key-1": cert}
+    google_certs = GoogleCerts(key_server["url"])
+
+    with pytest.raises(ValueError):
+        await google_certs.verify(make_token(signer, iss="evil.com"), AUDIENCE)
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from model import queries
+from model.db import engine
+from model.read import SEARCH_PRODUCTS
+
+
+def explain(stmt, params):
+    compiled = stmt.compile(dialect=postgresql.dialect(paramstyle="named"))
+    return text(f"EXPLAIN (FORMAT JSON) {compiled}"), {**compiled.params, **params}
+
+
+def plan_node_types(plan):
+    yield plan["Node Type"]
+    for child in plan.get("Plans", []):
+        yield from plan_node_types(child)
+
+
+HOT_QUERIES = {
+    "products_list": (queries.ACTIVE_PRODUCTS, {"limit": 101}),
+    "products_page": (
+        queries.ACTIVE_PRODUCTS_AFTER,
+        {"limit": 101, "created_at": datetime(2024, 1, 1), "id": "0"},
+    ),
+    "product_by_id": (
+        queries.PRODUCT_BY_ID,
+        {"id": "0c5f630c-8437-4871-9397-9421a12e439a"},
+    ),
+    "user_by_email": (queries.USER_BY_EMAIL, {"email": "test@example.com"}),
+    "products_version": (queries.PRODUCTS_VERSION, {}),
+    "product_version": (queries.PRODUCT_VERSION, {"id": "0"}),
+    "expire_sessions": (queries.EXPIRE_SESSIONS, {"user_id": 1}),
+    "reap_sessions": (
+        queries.REAP_SESSIONS,
+        {"cutoff": datetime(2024, 1, 1), "limit": 1000},
+    ),
+    "product_search": (
+        SEARCH_PRODUCTS[(False, False, False)],
+        {"q": "product", "limit": 21},
+    ),
+    "product_search_fuzzy": (
+        SEARCH_PRODUCTS[(True, False, False)],
+        {"q": "prodcut", "limit": 21},
+    ),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", HOT_QUERIES)
+async def test_hot_query_uses_index(name):
+    async with engine.connect() as conn:
+        # Tiny test tables always look cheapest to scan, so only fall back to a
+        # sequential scan when no index can serve the query at all
+        await conn.execute(text("SET enable_seqscan = off"))
+        result = await conn.execute(*explain(*HOT_QUERIES[name]))
+        plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    node_types = list(plan_node_types(plan[0]["Plan"]))
+    print(name, node_types)
+    assert "Seq Scan" not in node_types
@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+import requests
+
+from config import settings
+from model.rollups import backfill, check_rollups
+
+
+@pytest.mark.asyncio
+async def test_create_order_without_stock(access_token):
+    # No inventory row exists for an unknown product, so nothing can be reserved
+    response = requests.post(
+        f"{settings.BASE_URL}/orders",
+        json={"items": [{"product_id": str(uuid.uuid4()), "quantity": 1}]},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 409
+    print(response.json())
+
+
+@pytest.mark.asyncio
+async def test_create_order_invalid_quantity(access_token):
+    response = requests.post(
+        f"{settings.BASE_URL}/orders",
+        json={"items": [{"product_id": str(uuid.uuid4()), "quantity": 0}]},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_update_missing_order_status(access_token):
+    response = requests.put(
+        f"{settings.BASE_URL}/orders/2147483647/status",
+        json={"status": "shipped"},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_sales(access_token):
+    for report in ("daily", "products", "customers"):
+        response = requests.get(
+            f"{settings.BASE_URL}/orders/sales/{report}",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        assert response.status_code == 200
+        print(response.json())
+
+
+@pytest.mark.asyncio
+async def test_get_sales_invalid_range(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/orders/sales/daily",
+        params={"start": "2026-02-01", "end": "2026-01-01"},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_backfill_matches_orders():
+    await backfill(days_per_batch=7)
+    assert await check_rollups() == []
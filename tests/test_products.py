@@ -37,6 +37,49 @@ async def test_get_products(access_token):
     pprint(response.json())
 
 
+@pytest.mark.asyncio
+async def test_get_products_paginated(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/products",
+        params={"limit": 1},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    next_cursor = response.json()["next_cursor"]
+    if next_cursor:
+        response = requests.get(
+            f"{settings.BASE_URL}/products",
+            params={"limit": 1, "cursor": next_cursor},
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        assert response.status_code == 200
+    pprint(response.json())
+
+
+@pytest.mark.asyncio
+async def test_get_products_invalid_cursor(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/products",
+        params={"cursor": "!!notbase64"},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.asyncio
+async def test_stream_products(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/products",
+        params={"stream": True},
+        headers={"Authorization": f"Bearer {access_token}"},
+        stream=True,
+    )
+    assert response.status_code == 200
+    for line in response.iter_lines():
+        print(line)
+
+
 @pytest.mark.asyncio
 async def test_get_product(access_token):
     global product_id
@@ -72,3 +115,163 @@ async def test_delete_product(access_token):
     )
     assert response.status_code == 200
     print(response.json())
+
+
+@pytest.mark.asyncio
+async def test_bulk_products(access_token):
+    bulk_ids = [str(uuid.uuid4()) for _ in range(3)]
+    response = requests.post(
+        f"{settings.BASE_URL}/products/bulk",
+        json={
+            "products": [
+                {
+                    "id": id,
+                    "name": f"Bulk Product {i}",
+                    "description": f"Description for Bulk Product {i}",
+                    "price": "10",
+                }
+                for i, id in enumerate(bulk_ids)
+            ]
+        },
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    print(response.json())
+
+    response = requests.put(
+        f"{settings.BASE_URL}/products/bulk",
+        json={"products": [{"id": id, "name": "Renamed"} for id in bulk_ids]},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    print(response.json())
+
+    response = requests.delete(
+        f"{settings.BASE_URL}/products/bulk",
+        json={"ids": bulk_ids},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    print(response.json())
+
+
+@pytest.mark.asyncio
+async def test_product_cache_stats(access_token):
+    for _ in range(2):
+        requests.get(
+            f"{settings.BASE_URL}/products/{product_id}",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+    response = requests.get(f"{settings.BASE_URL}/cache")
+    assert response.status_code == 401
+    response = requests.get(
+        f"{settings.BASE_URL}/cache",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    pprint(response.json())
+
+
+@pytest.mark.asyncio
+async def test_update_inventory_slots(access_token):
+    response = requests.put(
+        f"{settings.BASE_URL}/products/{product_id}/slots",
+        json={"slots": 4},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    print(response.json())
+
+    response = requests.put(
+        f"{settings.BASE_URL}/products/{product_id}/slots",
+        json={"slots": -1},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_search_products(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/products/search",
+        params={"q": "product", "limit": 1},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    next_cursor = response.json()["next_cursor"]
+    if next_cursor:
+        response = requests.get(
+            f"{settings.BASE_URL}/products/search",
+            params={"q": "product", "limit": 1, "cursor": next_cursor},
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        assert response.status_code == 200
+    pprint(response.json())
+
+    response = requests.get(
+        f"{settings.BASE_URL}/products/search",
+        params={"q": "prodcut", "fuzzy": True},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    pprint(response.json())
+
+
+@pytest.mark.asyncio
+async def test_search_products_invalid_cursor(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/products/search",
+        params={"q": "product", "cursor": "!!notbase64"},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.asyncio
+async def test_products_not_modified(access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    for url in (
+        f"{settings.BASE_URL}/products",
+        f"{settings.BASE_URL}/products/{product_id}",
+    ):
+        response = requests.get(url, headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = requests.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_products_etag_changes_on_write(access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"{settings.BASE_URL}/products"
+    etag = requests.get(url, headers=headers).headers["ETag"]
+
+    response = requests.post(
+        url,
+        json={"name": "Versioned Product", "description": "", "price": "1"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = requests.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_products_compressed(access_token):
+    response = requests.get(
+        f"{settings.BASE_URL}/products",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Accept-Encoding": "gzip",
+        },
+    )
+    assert response.status_code == 200
+    if len(response.content) >= settings.COMPRESSION_MINIMUM_SIZE:
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
@@ -0,0 +1,67 @@
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core.ratelimit import RateLimitMiddleware, SharedBuckets
+
+
+def decode(token):
+    return {"id": int(token)}
+
+
+def make_app(path, limits):
+    app = FastAPI()
+
+    @app.get("/items/{id}")
+    async def item(id: int):
+        return {"id": id}
+
+    @app.get("/health")
+    async def health():
+        return {"health": "ok"}
+
+    app.add_middleware(
+        RateLimitMiddleware, limits=limits, path=path, slots=64, decode=decode
+    )
+    return app
+
+
+def test_bucket_allows_burst_then_waits(tmp_path):
+    buckets = SharedBuckets(str(tmp_path / "buckets"), 64)
+    assert [buckets.take("client", 2, 3) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("client", 2, 3) == pytest.approx(0.5, abs=0.01)
+    assert buckets.take("other", 2, 3) == 0
+
+
+def test_bucket_refills(tmp_path):
+    buckets = SharedBuckets(str(tmp_path / "buckets"), 64)
+    assert buckets.take("client", 100, 1) == 0
+    assert buckets.take("client", 100, 1) > 0
+    time.sleep(0.02)
+    assert buckets.take("client", 100, 1) == 0
+
+
+def test_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "buckets")
+    first, second = SharedBuckets(path, 64), SharedBuckets(path, 64)
+    assert first.take("client", 1, 1) == 0
+    assert second.take("client", 1, 1) > 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_limits_per_route_and_client(tmp_path):
+    app = make_app(str(tmp_path / "buckets"), {"*": (1, 2), "/items/{id}": (1, 1)})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/items/1")).status_code == 200
+        # Every item shares the route's bucket
+        response = await client.get("/items/2")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        # Other routes fall back to the default limit
+        assert (await client.get("/health")).status_code == 200
+        # Authenticated users get their own buckets
+        user = {"Authorization": "Bearer 7"}
+        assert (await client.get("/items/1", headers=user)).status_code == 200
@@ -34,3 +34,17 @@ async def test_update_company(access_token):
     assert response.json()["message"] == "Company updated successfully"
     assert response.json()["data"]["company_id"] == company_id
     print(response.json())
+
+
+@pytest.mark.asyncio
+async def test_company_not_modified(access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"{settings.BASE_URL}/company/{company_id}"
+    response = requests.get(url, headers=headers)
+    assert response.status_code == 200
+    last_modified = response.headers["Last-Modified"]
+
+    response = requests.get(
+        url, headers={**headers, "If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from core import slack
+
+
+@pytest.mark.asyncio
+async def test_suppressed_count_flushed_after_window(monkeypatch):
+    monkeypatch.setattr(slack, "DEDUPE_WINDOW_SECONDS", 0.5)
+    monkeypatch.setattr(slack, "BATCH_WAIT_SECONDS", 0.05)
+    notifier = slack.SlackNotifier()
+    posts = []
+
+    async def post(text, channel, webhook_url):
+        posts.append(text)
+
+    monkeypatch.setattr(notifier, "_post", post)
+    await notifier.start()
+    try:
+        notifier.notify("boom", "errors", "https://hooks.example.com")
+        await asyncio.sleep(0.2)
+        for _ in range(499):
+            notifier.notify("boom", "errors", "https://hooks.example.com")
+        # The burst is reported once its window ends, without another "boom"
+        await asyncio.sleep(0.8)
+        assert posts == ["boom", "boom (x499 suppressed)"]
+    finally:
+        await notifier.stop()
+    assert len(posts) == 2